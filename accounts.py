@@ -0,0 +1,269 @@
+import secrets
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from booster import open_booster
+from cache import get_cache
+from cards import CATALOG, STARTER_DECKS, VehicleCard, filter_codes
+from storage import db
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+START_COINS = 250
+SESSION_TTL_S = 7 * 24 * 3600
+COLLECTION_PAGE_SIZE = 12
+USER_CACHE_SIZE = 4096
+USER_CACHE_TTL_S = 30.0  # upper bound for staleness in other worker processes
+
+COLLECTIONS = get_cache("collection", USER_CACHE_SIZE, USER_CACHE_TTL_S)
+DECKS = get_cache("deck", USER_CACHE_SIZE, USER_CACHE_TTL_S)  # user_id -> (name, cards)
+
+BOOSTER_COST = {"feuer": 25, "rd": 25, "thl": 25}
+
+
+# =========================================================
+# COLLECTION / DECK HELPERS
+# =========================================================
+
+UPSERT_USER_CARD = (
+    "INSERT INTO user_cards(user_id, card_code, qty) VALUES (?, ?, ?) "
+    "ON CONFLICT(user_id, card_code) DO UPDATE SET qty=qty+excluded.qty"
+)
+
+
+def _card_rows(user_id: int, cards: Dict[str, int]) -> List[Tuple[int, str, int]]:
+    for code in cards:
+        if code not in CATALOG:
+            raise RuntimeError(f"Unbekannte Karte: {code}")
+    return [(int(user_id), code, int(qty)) for code, qty in cards.items() if int(qty) > 0]
+
+
+def add_cards(con: sqlite3.Connection, user_id: int, cards: Dict[str, int]) -> None:
+    # one UPSERT per distinct card, sent as a single executemany batch;
+    # the caller runs invalidate_user() once its transaction has committed
+    rows = _card_rows(user_id, cards)
+    if rows:
+        con.executemany(UPSERT_USER_CARD, rows)
+
+
+def add_cards_to_user(con: sqlite3.Connection, user_id: int, card_code: str, qty: int) -> None:
+    add_cards(con, user_id, {card_code: qty})
+
+
+def grant_cards_bulk(grants: Dict[int, Dict[str, int]]) -> int:
+    """Credit many cards to many users in one transaction (promotions). Returns rows written."""
+    rows = [row for user_id, cards in grants.items() for row in _card_rows(user_id, cards)]
+    if not rows:
+        return 0
+    with db(immediate=True) as con:
+        con.executemany(UPSERT_USER_CARD, rows)
+    for user_id in grants:
+        COLLECTIONS.invalidate(int(user_id))
+    return len(rows)
+
+
+def grant_starter_deck(con: sqlite3.Connection, user_id: int, deck_name: str) -> None:
+    # starter decks are validated once at import (cards.py)
+    deck = STARTER_DECKS.get(deck_name)
+    if deck is None:
+        raise RuntimeError("Unbekanntes Starterdeck.")
+
+    add_cards(con, user_id, deck)
+    _write_deck(con, user_id, deck_name, deck)
+
+
+def _write_deck(con: sqlite3.Connection, user_id: int, deck_name: str, cards: Dict[str, int]) -> None:
+    con.execute("INSERT OR REPLACE INTO decks(user_id, name, size) VALUES (?, ?, ?)", (user_id, deck_name, 40))
+    con.execute("DELETE FROM deck_cards WHERE user_id=?", (user_id,))
+    con.executemany(
+        "INSERT INTO deck_cards(user_id, card_code, qty) VALUES (?, ?, ?)",
+        [(user_id, code, int(qty)) for code, qty in cards.items() if int(qty) > 0],
+    )
+
+
+# =========================================================
+# READ MODELS (cached per user)
+# =========================================================
+
+def _read_collection(user_id: int) -> Dict[str, int]:
+    with db() as con:
+        rows = con.execute("SELECT card_code, qty FROM user_cards WHERE user_id=? ORDER BY card_code", (user_id,)).fetchall()
+    return {r["card_code"]: int(r["qty"]) for r in rows}
+
+
+def _read_deck(user_id: int) -> Tuple[str, Dict[str, int]]:
+    with db() as con:
+        row = con.execute("SELECT name FROM decks WHERE user_id=?", (user_id,)).fetchone()
+        rows = con.execute("SELECT card_code, qty FROM deck_cards WHERE user_id=? ORDER BY card_code", (user_id,)).fetchall()
+    return (row["name"] if row else "Kein Deck"), {r["card_code"]: int(r["qty"]) for r in rows}
+
+
+def invalidate_user(user_id: int) -> None:
+    COLLECTIONS.invalidate(int(user_id))
+    DECKS.invalidate(int(user_id))
+
+
+def get_collection(user_id: int) -> Dict[str, int]:
+    # copies: callers may edit the dicts they get back
+    return dict(COLLECTIONS.get_or_load(int(user_id), lambda: _read_collection(user_id)))
+
+
+def collection_page(user_id: int, theme: str = "", rarity: str = "", text: str = "",
+                    page: int = 0, page_size: int = COLLECTION_PAGE_SIZE) -> Tuple[List[Tuple[str, int]], int]:
+    """One page of the filtered collection as [(code, qty)] plus the number of matching cards.
+
+    Out-of-range pages are clamped to the last one.
+    """
+    coll = COLLECTIONS.get_or_load(int(user_id), lambda: _read_collection(user_id))
+    codes = filter_codes(coll, theme, rarity, text)
+    page_size = max(1, int(page_size))
+    last = max(0, (len(codes) - 1) // page_size)
+    start = min(max(0, int(page)), last) * page_size
+    return [(c, int(coll[c])) for c in codes[start:start + page_size]], len(codes)
+
+
+def get_deck(user_id: int) -> Dict[str, int]:
+    return dict(DECKS.get_or_load(int(user_id), lambda: _read_deck(user_id))[1])
+
+
+def get_deck_name(user_id: int) -> str:
+    return DECKS.get_or_load(int(user_id), lambda: _read_deck(user_id))[0]
+
+
+def read_deck(user_id: int) -> Dict[str, int]:
+    """The saved deck straight from the DB, for decisions another worker's save must not miss."""
+    return _read_deck(user_id)[1]
+
+
+def save_custom_deck(user_id: int, deck_name: str, cards: Dict[str, int]) -> Tuple[bool, str]:
+    deck_name = (deck_name or "Eigenes Deck").strip() or "Eigenes Deck"
+
+    total = sum(int(v) for v in cards.values() if int(v) > 0)
+    if total != 40:
+        return False, f"Deck muss exakt 40 Karten haben (aktuell {total})."
+
+    owned = _read_collection(user_id)  # never validate ownership against a cached copy
+    for code, qty in cards.items():
+        q = int(qty)
+        if q < 0:
+            return False, "Negative Mengen sind nicht erlaubt."
+        if q > 0 and owned.get(code, 0) < q:
+            return False, f"Nicht genug Kopien für {code}: benötigt {q}, vorhanden {owned.get(code, 0)}"
+        if q > 0 and code not in CATALOG:
+            return False, f"Unbekannte Karte im Deck: {code}"
+
+    try:
+        with db(immediate=True) as con:
+            _write_deck(con, user_id, deck_name, cards)
+        DECKS.invalidate(int(user_id))
+        return True, "Deck gespeichert."
+    except Exception as e:
+        return False, f"Speichern fehlgeschlagen: {e}"
+
+
+# =========================================================
+# AUTH
+# =========================================================
+
+def register_user(username: str, password: str, starter_deck_name: str) -> Tuple[bool, str]:
+    username = username.strip()
+    if not username:
+        return False, "Bitte einen Username eingeben."
+    if not password or len(password) < 4:
+        return False, "Passwort muss mindestens 4 Zeichen haben."
+
+    try:
+        with db(immediate=True) as con:
+            now = int(time.time())
+            con.execute(
+                "INSERT INTO users(username, password, coins, created_at) VALUES (?,?,?,?)",
+                (username, password, START_COINS, now),
+            )
+            user_id = con.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()["id"]
+
+            grant_starter_deck(con, int(user_id), starter_deck_name)
+        invalidate_user(int(user_id))
+
+        return True, "Registrierung erfolgreich. Starterdeck wurde vergeben."
+    except sqlite3.IntegrityError:
+        return False, "Username existiert bereits."
+    except Exception as e:
+        return False, f"Registrierung fehlgeschlagen: {e}"
+
+
+def login_user(username: str, password: str) -> Optional[dict]:
+    with db() as con:
+        row = con.execute(
+            "SELECT id, username, coins FROM users WHERE username=? AND password=?",
+            (username.strip(), password),
+        ).fetchone()
+    if not row:
+        return None
+    return {"user_id": int(row["id"]), "username": row["username"], "coins": int(row["coins"])}
+
+
+def refresh_user(user_id: int) -> dict:
+    with db() as con:
+        row = con.execute("SELECT id, username, coins FROM users WHERE id=?", (user_id,)).fetchone()
+    return {"user_id": int(row["id"]), "username": row["username"], "coins": int(row["coins"])}
+
+
+def create_session(user_id: int) -> str:
+    token = secrets.token_urlsafe(24)
+    now = int(time.time())
+    with db() as con:
+        con.execute("DELETE FROM sessions WHERE expires_at<?", (now,))
+        con.execute(
+            "INSERT INTO sessions(token, user_id, expires_at) VALUES (?, ?, ?)",
+            (token, int(user_id), now + SESSION_TTL_S),
+        )
+    return token
+
+
+def session_user(token: str) -> Optional[int]:
+    with db() as con:
+        row = con.execute(
+            "SELECT user_id FROM sessions WHERE token=? AND expires_at>=?",
+            (token, int(time.time())),
+        ).fetchone()
+    return int(row["user_id"]) if row else None
+
+
+def delete_session(token: str) -> None:
+    with db() as con:
+        con.execute("DELETE FROM sessions WHERE token=?", (token,))
+
+
+# =========================================================
+# BOOSTER
+# =========================================================
+
+def buy_open_booster(user_id: int, theme: str) -> Tuple[bool, str, Optional[List[VehicleCard]]]:
+    theme = theme.strip().lower()
+    if theme not in BOOSTER_COST:
+        return False, "Ungültiges Booster-Theme.", None
+
+    cost = int(BOOSTER_COST[theme])
+    # roll before taking the write lock; a refused purchase just discards the pack
+    cards = open_booster(theme)
+    codes = [c.code for c in cards]
+
+    with db() as con:
+        # guarded debit: the coin check and the debit are one statement, so no double spend
+        cur = con.execute("UPDATE users SET coins=coins-? WHERE id=? AND coins>=?", (cost, user_id, cost))
+        if cur.rowcount != 1:
+            exists = con.execute("SELECT 1 FROM users WHERE id=?", (user_id,)).fetchone()
+            return False, ("Nicht genug Coins." if exists else "User nicht gefunden."), None
+
+        add_cards(con, user_id, Counter(codes))
+        con.execute(
+            "INSERT INTO booster_purchases(user_id, theme, cost, cards, created_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, theme, cost, ",".join(codes), int(time.time())),
+        )
+    COLLECTIONS.invalidate(int(user_id))
+
+    return True, "Booster geöffnet.", cards
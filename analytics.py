@@ -0,0 +1,229 @@
+"""Deck analytics: exact odds that a deck can answer each incident from its hand.
+
+    python analytics.py                       odds for every starter deck
+    python analytics.py --deck "Brandbekämpfung" --ep 10 --draws 5
+
+For every incident of the catalog and every hand size from the opening
+hand (HAND_SIZE) up to HAND_SIZE + draws: the probability that the hand holds a
+set of cards whose combined axis values meet the incident's requirement and
+whose EP costs fit the budget. Exact multivariate hypergeometric, no sampling.
+
+It is a question about the hand only: the one-card-per-turn rule, crew and the
+opponent's cards are not part of it.
+"""
+import argparse
+import itertools
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from math import comb
+from typing import Dict, List, Tuple
+
+from cards import AXES, CATALOG, INCIDENTS, meets, req_vector
+from duel import HAND_SIZE, MAX_EP, START_EP
+MAX_DRAWS = 5   # a round win draws 5 cards
+
+
+@dataclass(frozen=True)
+class IncidentOdds:
+    code: str
+    name: str
+    req: Tuple[Tuple[str, int], ...]   # (axis, value) for the required axes
+    hand_sizes: Tuple[int, ...]
+    p: Tuple[float, ...]               # one probability per hand size
+
+
+# =========================================================
+# EXACT ODDS
+# =========================================================
+# Cards are projected onto the incident: their values on the required axes,
+# capped at the requirement, plus their EP cost. Cards with the same projection
+# form one class; cards that add nothing or cost more than the budget are
+# "other". A class never needs more copies than it takes to saturate its axes,
+# so per class only min(copies in hand, cap) matters.
+#
+# Class by class, a hand is described by how many copies of each class it holds
+# (the last value meaning "cap or more"). What matters about the chosen cards is
+# their min-cost table over capped totals (a tiny knapsack), so hands are grouped
+# by that table and each group carries its generating polynomial
+# sum_k ways(k) x^k over the hand size k. Once a table meets the requirement
+# within budget, every hand that extends it does too, so the rest of the deck is
+# multiplied in at once (C(rest, k)). Probability for hand size n = coefficient
+# of x^n / C(deck size, n); all counts are exact integers.
+
+Poly = List[int]
+
+
+def _mul(a: Poly, b: Poly, deg: int) -> Poly:
+    out = [0] * (min(deg + 1, len(a) + len(b) - 1))
+    for i, x in enumerate(a):
+        if x:
+            for j in range(min(len(b), deg + 1 - i)):
+                out[i + j] += x * b[j]
+    return out
+
+
+def _classes(deck: Dict[str, int], need: List[int], axes: List[int], budget: int,
+             max_hand: int) -> List[Tuple[Tuple[int, ...], int, int, int]]:
+    """(capped values, cost, copies in deck, cap) per class of useful cards."""
+    merged: Dict[Tuple[Tuple[int, ...], int], int] = {}
+    for code, qty in deck.items():
+        card = CATALOG[code]
+        vals = tuple(min(card.vec[a], n) for a, n in zip(axes, need))
+        if qty <= 0 or not any(vals) or card.cost_ep > budget:
+            continue
+        key = (vals, int(card.cost_ep))
+        merged[key] = merged.get(key, 0) + int(qty)
+
+    classes = []
+    for (vals, cost), copies in merged.items():
+        saturate = max(-(-n // v) for v, n in zip(vals, need) if v > 0)
+        cap = min(copies, max_hand, budget // max(1, cost), saturate)
+        classes.append((vals, cost, copies, cap))
+    # most value per EP first: tables meet the requirement early and leave the search
+    classes.sort(key=lambda c: -sum(c[0]) / max(1, c[1]))
+    return classes
+
+
+def _incident_ways(deck: Dict[str, int], req: Tuple[int, ...], budget: int, max_hand: int) -> Poly:
+    """Number of hands of each size (index) that can answer ``req`` within ``budget``."""
+    axes = [i for i, r in enumerate(req) if r > 0]
+    need = [req[i] for i in axes]
+    deck_size = sum(deck.values())
+    if not axes:
+        return [comb(deck_size, k) for k in range(max_hand + 1)]
+
+    classes = _classes(deck, need, axes, budget, max_hand)
+    # cards not yet decided after class i (incl. the useless ones)
+    rest = [deck_size]
+    for _, _, copies, _ in classes:
+        rest.append(rest[-1] - copies)
+
+    # min-cost table over capped totals, flattened with mixed radix (need_a + 1);
+    # costs above the budget are stored as ``inf`` so equivalent tables merge
+    place = []
+    size = 1
+    for n in need:
+        place.append(size)
+        size *= n + 1
+    goal = size - 1
+    inf = budget + 1
+    targets: Dict[Tuple[int, ...], List[int]] = {}
+    for vals, _, _, _ in classes:
+        if vals not in targets:
+            dst = []
+            for idx in range(size):
+                d = 0
+                for a in range(len(need)):
+                    digit = idx // place[a] % (need[a] + 1)
+                    d += min(need[a], digit + vals[a]) * place[a]
+                dst.append(d)
+            targets[vals] = dst
+
+    def add(table: Tuple[int, ...], dst: List[int], cost: int) -> Tuple[int, ...]:
+        out = list(table)
+        for idx, c in enumerate(table):
+            c += cost
+            if c <= budget and c < out[dst[idx]]:
+                out[dst[idx]] = c
+        return tuple(out)
+
+    total = [0] * (max_hand + 1)
+    start = [inf] * size
+    start[0] = 0
+    states: Dict[Tuple[int, ...], Poly] = {tuple(start): [1]}
+    for i, (vals, cost, copies, cap) in enumerate(classes):
+        tail = [comb(rest[i + 1], k) for k in range(max_hand + 1)]
+        buckets = [[0] * s + [comb(copies, s)] for s in range(cap)]
+        buckets.append([0] * cap + [comb(copies, k) for k in range(cap, min(copies, max_hand) + 1)])
+        nxt: Dict[Tuple[int, ...], Poly] = {}
+        for table, poly in states.items():
+            for s, bucket in enumerate(buckets):
+                if s:
+                    table = add(table, targets[vals], cost)
+                p = _mul(poly, bucket, max_hand)
+                if table[goal] <= budget:
+                    for k, x in enumerate(_mul(p, tail, max_hand)):
+                        total[k] += x
+                    continue
+                acc = nxt.get(table)
+                if acc is None:
+                    nxt[table] = p
+                else:
+                    if len(acc) < len(p):
+                        acc.extend([0] * (len(p) - len(acc)))
+                    for k, x in enumerate(p):
+                        acc[k] += x
+        states = nxt
+    return total  # hands whose table never meets the requirement are not counted
+
+
+@lru_cache(maxsize=256)
+def _odds(deck_key: Tuple[Tuple[str, int], ...], budget: int, draws: int) -> Tuple[IncidentOdds, ...]:
+    deck = dict(deck_key)
+    deck_size = sum(deck.values())
+    sizes = tuple(n for n in range(HAND_SIZE, HAND_SIZE + draws + 1) if n <= deck_size)
+    out = []
+    for inc in INCIDENTS:
+        req = req_vector(inc.req)
+        ways = _incident_ways(deck, req, budget, sizes[-1]) if sizes else []
+        out.append(IncidentOdds(
+            code=inc.code,
+            name=inc.name,
+            req=tuple((a, r) for a, r in zip(AXES, req) if r > 0),
+            hand_sizes=sizes,
+            p=tuple(ways[n] / comb(deck_size, n) for n in sizes),
+        ))
+    return tuple(out)
+
+
+def draw_odds(deck: Dict[str, int], ep_budget: int = START_EP, draws: int = MAX_DRAWS) -> List[IncidentOdds]:
+    """Odds per incident for hand sizes HAND_SIZE .. HAND_SIZE + draws (memoized per deck composition)."""
+    key = tuple(sorted((c, int(q)) for c, q in deck.items() if int(q) > 0))
+    return list(_odds(key, int(ep_budget), max(0, int(draws))))
+
+
+# =========================================================
+# CHECK
+# =========================================================
+
+def hand_answers(hand: List[str], req: Tuple[int, ...], budget: int) -> bool:
+    """Direct check for one hand: tries every subset of its cards (for cross-checks, not for the UI)."""
+    cards = [CATALOG[c] for c in hand]
+    cards = [c for c in cards if c.cost_ep <= budget and any(v and r for v, r in zip(c.vec, req))]
+    for n in range(1, len(cards) + 1):
+        for combo in itertools.combinations(cards, n):
+            totals = [sum(col) for col in zip(*(c.vec for c in combo))]
+            if sum(c.cost_ep for c in combo) <= budget and meets(req, totals):
+                return True
+    return not any(req)
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main() -> None:
+    from cards import starter_decks
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--deck", action="append", default=[], help="starter deck name (default: all)")
+    ap.add_argument("--ep", type=int, default=START_EP, help="EP budget")
+    ap.add_argument("--draws", type=int, default=MAX_DRAWS)
+    args = ap.parse_args()
+
+    decks = starter_decks()
+    for name in args.deck or list(decks):
+        deck = decks[name]
+        t0 = time.perf_counter()
+        odds = draw_odds(deck, args.ep, args.draws)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{name} (EP {args.ep}, {ms:.0f} ms)")
+        print("  " + " " * 28 + "".join(f"{n:>7}" for n in odds[0].hand_sizes))
+        for o in odds:
+            req = ", ".join(f"{a} {r}" for a, r in o.req)
+            print(f"  {o.code} {req:<22}" + "".join(f"{p:>7.1%}" for p in o.p))
+
+
+if __name__ == "__main__":
+    main()
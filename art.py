@@ -0,0 +1,139 @@
+"""Card art lookup and thumbnail cache.
+
+    python art.py            pre-generate thumbnails for all widths in THUMB_WIDTHS
+
+Which art files exist is indexed once per process (one directory listing per kind)
+instead of an os.path.exists per card per rerun. Thumbnails are resized once with
+Pillow, written next to the cache dir and then served as bytes from memory.
+"""
+import io
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from cache import get_cache
+
+try:
+    from PIL import Image
+except ImportError:  # API-only installs; originals are served unresized
+    Image = None
+
+ART_ROOT = os.path.join("assets", "cards")
+THUMB_DIR = os.environ.get("BFTCG_THUMBS", os.path.join(".cache", "thumbs"))
+KINDS = ("vehicles", "incidents")
+# widths the UI renders at: Booster 240, Sammlung 280, Duell incidents 320, Duell hand / Deck-Editor 360
+THUMB_WIDTHS = (240, 280, 320, 360)
+
+THUMBS = get_cache("art", maxsize=1024, ttl_s=24 * 3600)
+
+_INDEX: Optional[Dict[Tuple[str, str], Tuple[str, float]]] = None  # (kind, code) -> (path, mtime)
+_INDEX_LOCK = threading.Lock()
+
+
+# =========================================================
+# INDEX
+# =========================================================
+
+def _scan() -> Dict[Tuple[str, str], Tuple[str, float]]:
+    index = {}
+    for kind in KINDS:
+        folder = os.path.join(ART_ROOT, kind)
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            code, ext = os.path.splitext(entry.name)
+            if ext.lower() == ".png" and entry.is_file():
+                index[(kind, code)] = (entry.path, entry.stat().st_mtime)
+    return index
+
+
+def art_index() -> Dict[Tuple[str, str], Tuple[str, float]]:
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = _scan()
+    return _INDEX
+
+
+def refresh_index() -> None:
+    """Rescan after art files were added or replaced."""
+    global _INDEX
+    with _INDEX_LOCK:
+        _INDEX = _scan()
+    THUMBS.clear()
+
+
+def has_art(kind: str, code: str) -> bool:
+    return (kind, code) in art_index()
+
+
+def art_path(kind: str, code: str) -> Optional[str]:
+    entry = art_index().get((kind, code))
+    return entry[0] if entry else None
+
+
+# =========================================================
+# THUMBNAILS
+# =========================================================
+
+def _thumb_path(kind: str, code: str, width: int) -> str:
+    return os.path.join(THUMB_DIR, kind, f"{code}@{int(width)}.png")
+
+
+def _render(src: str, width: int) -> bytes:
+    with Image.open(src) as im:
+        if im.width > width:
+            height = max(1, round(im.height * width / im.width))
+            im = im.resize((width, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.save(buf, format="PNG", optimize=True)
+        return buf.getvalue()
+
+
+def _load_thumbnail(kind: str, code: str, width: int) -> Optional[bytes]:
+    entry = art_index().get((kind, code))
+    if entry is None:
+        return None
+    src, src_mtime = entry
+    if Image is None:
+        with open(src, "rb") as f:
+            return f.read()
+
+    dst = _thumb_path(kind, code, width)
+    try:
+        if os.stat(dst).st_mtime >= src_mtime:
+            with open(dst, "rb") as f:
+                return f.read()
+    except FileNotFoundError:
+        pass
+
+    data = _render(src, width)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, dst)  # atomic, parallel workers may render the same thumb
+    return data
+
+
+def thumbnail(kind: str, code: str, width: int) -> Optional[bytes]:
+    """PNG bytes of the art scaled to ``width`` px, or None if the card has no art."""
+    if not has_art(kind, code):
+        return None
+    return THUMBS.get_or_load((kind, code, int(width)), lambda: _load_thumbnail(kind, code, width))
+
+
+def build_thumbnails(widths: Tuple[int, ...] = THUMB_WIDTHS) -> int:
+    n = 0
+    for kind, code in sorted(art_index()):
+        for w in widths:
+            if thumbnail(kind, code, w) is not None:
+                n += 1
+    return n
+
+
+if __name__ == "__main__":
+    if Image is None:
+        raise SystemExit("Pillow fehlt: pip install pillow")
+    print(f"{build_thumbnails()} Thumbnails in {THUMB_DIR}")
@@ -0,0 +1,1039 @@
+"""Micro-benchmarks and stress checks for the non-UI layers.
+
+    python bench.py db [--ops 5000] [--threads 4]
+    python bench.py match-stress [--threads 8] [--actions 400]
+    python bench.py booster-stress [--threads 16] [--attempts 20]
+    python bench.py plans
+    python bench.py api [--pairs 8] [--actions 100]      (needs fastapi + httpx)
+    python bench.py delta [--games 50] [--fuzz 2000]
+    python bench.py codec [--games 50]
+    python bench.py cache [--users 200] [--ops 20000]
+    python bench.py match-cache [--rooms 4] [--actions 500]
+    python bench.py split [--rooms 4] [--buyers 4] [--ops 300]
+    python bench.py seed [--games 30]
+    python bench.py art [--renders 20]                   (needs pillow)
+    python bench.py odds [--decks 50] [--small 20]
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import storage
+
+
+# =========================================================
+# HELPERS
+# =========================================================
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    idx = min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))
+    return s[idx]
+
+
+def timed(lat: List[float], errors: List[int], op: Callable[[], None]) -> None:
+    t0 = time.perf_counter()
+    try:
+        op()
+    except sqlite3.OperationalError:
+        errors.append(1)
+        return
+    lat.append(time.perf_counter() - t0)
+
+
+def run_threads(fn: Callable[[int, List[float], List[int]], None], threads: int) -> Dict[str, float]:
+    results: List[List[float]] = [[] for _ in range(threads)]
+    errors: List[List[int]] = [[] for _ in range(threads)]
+
+    def worker(i: int) -> None:
+        fn(i, results[i], errors[i])
+
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    lat = [x for r in results for x in r]
+    return {
+        "ops": len(lat),
+        "ops_per_s": len(lat) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(lat, 50) * 1000,
+        "p99_ms": percentile(lat, 99) * 1000,
+        "errors": sum(len(e) for e in errors),
+    }
+
+
+def print_row(label: str, r: Dict[str, float]) -> None:
+    print(f"{label:<28} {r['ops']:>7} ops  {r['ops_per_s']:>10.0f} ops/s  "
+          f"p50 {r['p50_ms']:>7.3f} ms  p99 {r['p99_ms']:>7.3f} ms  errors {r['errors']}")
+
+
+# =========================================================
+# DB: per-call connect vs. pool
+# =========================================================
+
+def _seed_db(path: str, users: int) -> None:
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, coins INTEGER NOT NULL DEFAULT 0)")
+    con.execute("CREATE TABLE user_cards(user_id INTEGER, card_code TEXT, qty INTEGER, PRIMARY KEY(user_id, card_code))")
+    con.executemany("INSERT INTO users(id, coins) VALUES (?, 0)", [(u,) for u in range(users)])
+    con.executemany(
+        "INSERT INTO user_cards(user_id, card_code, qty) VALUES (?, ?, ?)",
+        [(u, f"V{100 + c}", 3) for u in range(users) for c in range(12)],
+    )
+    con.commit()
+    con.close()
+
+
+def _legacy_connect(path: str) -> sqlite3.Connection:
+    # what streamlit_app.db() did before the pool
+    con = sqlite3.connect(path, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+def bench_db(ops: int, threads: int) -> None:
+    users = 50
+    per_thread = max(1, ops // threads)
+
+    def one_op(con: sqlite3.Connection, n: int, uid: int) -> None:
+        if n % 10 == 0:
+            con.execute("UPDATE users SET coins=coins+1 WHERE id=?", (uid,))
+        else:
+            con.execute("SELECT card_code, qty FROM user_cards WHERE user_id=? ORDER BY card_code", (uid,)).fetchall()
+
+    def legacy(path: str):
+        def fn(i: int, lat: List[float], errors: List[int]) -> None:
+            for n in range(per_thread):
+                def op() -> None:
+                    con = _legacy_connect(path)
+                    try:
+                        one_op(con, n, (i * per_thread + n) % users)
+                        con.commit()
+                    finally:
+                        con.close()
+                timed(lat, errors, op)
+        return fn
+
+    def pooled(pool: storage.ConnectionPool):
+        def fn(i: int, lat: List[float], errors: List[int]) -> None:
+            for n in range(per_thread):
+                def op() -> None:
+                    with pool.connection() as con:
+                        one_op(con, n, (i * per_thread + n) % users)
+                timed(lat, errors, op)
+        return fn
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.sqlite3")
+        pooled_path = os.path.join(tmp, "pooled.sqlite3")
+        _seed_db(legacy_path, users)
+        _seed_db(pooled_path, users)
+
+        print(f"db: {threads} threads, {per_thread} ops/thread (90% reads, 10% writes)")
+        print_row("connect per call (before)", run_threads(legacy(legacy_path), threads))
+        pool = storage.ConnectionPool(pooled_path)
+        print_row("pooled + WAL (after)", run_threads(pooled(pool), threads))
+        pool.close()
+
+
+# =========================================================
+# MATCH: optimistic concurrency stress
+# =========================================================
+
+def use_temp_db(tmp: str) -> None:
+    storage.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+    storage.init_db()
+
+
+def seed_match(room_code: str, p1: int = 1, p2: int = 2) -> None:
+    import cards
+    import duel
+    import match_store
+
+    with storage.db() as con:
+        for uid in (p1, p2):
+            con.execute(
+                "INSERT OR IGNORE INTO users(id, username, password, coins) VALUES (?, ?, 'x', 0)",
+                (uid, f"bench{uid}"),
+            )
+    decks = list(cards.starter_decks().values())
+    d1 = cards.deck_to_list(decks[0])
+    d2 = cards.deck_to_list(decks[1])
+    match_store.match_create(room_code, duel.new_match_state(p1, p2, d1, d2, seed=duel.new_seed()))
+
+
+def stress_match(threads: int, actions: int, per_room: int = 20) -> None:
+    import bots
+    import match_store
+
+    # pressure escalates and crew runs dry after a few dozen turns, leaving only
+    # advances; fresh rooms every ``per_room`` actions keep assigns in the race
+    rooms = [f"STRESS{r}" for r in range(max(1, -(-actions // per_room)))]
+    ok_counts = [{"assign": 0, "advance": 0} for _ in range(threads)]
+
+    def worker(i: int) -> None:
+        rng = random.Random(i)
+        for n in range(actions):
+            room = rooms[n // per_room]
+            state = match_store.match_load(room)
+            uid = int(state["active_player"])
+            # legal on the loaded state, so concurrent assigns race on the version, not on the rules
+            moves = bots.legal_moves(state, uid)
+            if moves and rng.random() < 0.7:
+                ok, _ = match_store.match_assign(room, uid, *rng.choice(moves))
+                kind = "assign"
+            else:
+                ok, _ = match_store.match_advance_phase(room, uid)
+                kind = "advance"
+            if ok:
+                ok_counts[i][kind] += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        for room in rooms:
+            seed_match(room)
+
+        t0 = time.perf_counter()
+        ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        stored = {"assign": 0, "advance": 0}
+        for room in rooms:
+            with storage.match_db(room) as con:
+                rows = con.execute(
+                    "SELECT kind, COUNT(*) AS n FROM match_events WHERE room_code=? AND kind<>'start' GROUP BY kind",
+                    (room,),
+                ).fetchall()
+            for r in rows:
+                stored[r["kind"]] += int(r["n"])
+            replayed = list(match_store.match_replay(room))[-1]
+            replayed["log"] = []
+            assert replayed == match_store.match_load(room), f"{room}: replay diverges from snapshot + tail"
+        acked = {k: sum(c[k] for c in ok_counts) for k in ("assign", "advance")}
+
+        print(f"match-stress: {threads} threads x {actions} actions over {len(rooms)} rooms in {elapsed:.2f}s "
+              f"({sum(acked.values()) / elapsed:.0f} acked actions/s)")
+        print(f"acked  {acked}")
+        print(f"stored {stored}")
+        assert stored["assign"] == acked["assign"], "lost or phantom assign"
+        assert stored["advance"] == acked["advance"], "lost or phantom advance"
+        print("OK: no lost updates")
+
+
+# =========================================================
+# BOOSTER: concurrent purchase stress
+# =========================================================
+
+def stress_booster(threads: int, attempts: int) -> None:
+    import accounts
+
+    coins = 250
+    cost = accounts.BOOSTER_COST["feuer"]
+    ok_counts = [0] * threads
+    lat: List[List[float]] = [[] for _ in range(threads)]
+
+    def worker(i: int) -> None:
+        for _ in range(attempts):
+            t0 = time.perf_counter()
+            ok, _, _ = accounts.buy_open_booster(1, "feuer")
+            lat[i].append(time.perf_counter() - t0)
+            ok_counts[i] += int(ok)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        with storage.db() as con:
+            con.execute("INSERT INTO users(id, username, password, coins) VALUES (1, 'buyer', 'x', ?)", (coins,))
+
+        t0 = time.perf_counter()
+        ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        with storage.db() as con:
+            left = int(con.execute("SELECT coins FROM users WHERE id=1").fetchone()["coins"])
+            ledger = int(con.execute("SELECT COUNT(*) AS n FROM booster_purchases WHERE user_id=1").fetchone()["n"])
+            owned = int(con.execute("SELECT COALESCE(SUM(qty), 0) AS n FROM user_cards WHERE user_id=1").fetchone()["n"])
+
+        bought = sum(ok_counts)
+        all_lat = [x for r in lat for x in r]
+        print(f"booster-stress: {threads} threads x {attempts} attempts in {elapsed:.2f}s "
+              f"({len(all_lat) / elapsed:.0f} purchases/s, p99 {percentile(all_lat, 99) * 1000:.2f} ms)")
+        print(f"bought {bought}  coins left {left}  ledger rows {ledger}  cards owned {owned}")
+        assert bought == coins // cost, "double spend or refused valid purchase"
+        assert left == coins - bought * cost and left >= 0
+        assert ledger == bought
+        assert owned == bought * 5
+        print("OK: no double spends")
+
+
+# =========================================================
+# PLANS: EXPLAIN QUERY PLAN over every query the app issues
+# =========================================================
+
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+# plan details that contain "SCAN" but do not read a table
+PLAN_SCAN_OK = ("CONSTANT ROW",)
+
+
+def _plan_problems(con: sqlite3.Connection, sql: str) -> List[str]:
+    rows = con.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    problems = []
+    for r in rows:
+        detail = r[3]
+        if detail.startswith("SCAN") and not any(ok in detail for ok in PLAN_SCAN_OK):
+            problems.append(detail)
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def check_plans() -> int:
+    """Run the app's data paths, capture every statement and flag table scans / temp sorts."""
+    import accounts
+    import cards
+    import match_store
+    import rooms
+
+    seen: List[str] = []
+    real_connect = storage.connect
+
+    def tracing_connect(path: str) -> sqlite3.Connection:
+        con = real_connect(path)
+        con.set_trace_callback(seen.append)
+        return con
+
+    storage.connect = tracing_connect
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            use_temp_db(tmp)
+            seen.clear()  # one-off migration statements are not hot paths
+            # enough rows that the planner prefers indexes the way it would in production
+            names = list(cards.starter_decks())
+            accounts.grant_cards_bulk({uid: {"V101": 1} for uid in range(1000, 1200)})
+            accounts.register_user("plan_a", "plan1234", names[0])
+            accounts.register_user("plan_b", "plan1234", names[1])
+            a = accounts.login_user("plan_a", "plan1234")
+            b = accounts.login_user("plan_b", "plan1234")
+            accounts.refresh_user(a["user_id"])
+            accounts.get_collection(a["user_id"])
+            accounts.get_deck_name(a["user_id"])
+            accounts.save_custom_deck(a["user_id"], "Plan", accounts.get_deck(a["user_id"]))
+            accounts.buy_open_booster(a["user_id"], "feuer")
+
+            ok, _, code = rooms.room_create(a["user_id"], "PLAN")
+            rooms.room_join(b["user_id"], code)
+            rooms.match_start(code)
+            for _ in range(match_store.SNAPSHOT_EVERY + 5):  # crosses a snapshot write
+                state = match_store.match_load(code)
+                uid = int(state["active_player"])
+                hand = state["players"][str(uid)]["hand"]
+                if state["phase"] == "planung" and hand:
+                    match_store.match_assign(code, uid, 0, hand[0])
+                match_store.match_advance_phase(code, uid)
+            list(match_store.match_replay(code))
+            match_store.match_log_count(code)
+            match_store.match_log_page(code, 1)
+            match_store.flush_active_matches()
+            rooms.room_finish(a["user_id"], code)
+            rooms.sweep()
+
+            # one concrete instance per statement shape (the trace has parameters inlined)
+            shapes: Dict[str, str] = {}
+            for sql in seen:
+                shape = " ".join(_SQL_LITERAL.sub("?", sql).split())
+                if shape.split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+                    shapes.setdefault(shape, sql)
+
+            with storage.db() as con:
+                con.set_trace_callback(None)
+                checked = 0
+                violations = 0
+                for shape, sql in shapes.items():
+                    checked += 1
+                    problems = _plan_problems(con, sql)
+                    if problems:
+                        violations += 1
+                        print(f"FAIL {shape}")
+                        for p in problems:
+                            print(f"     {p}")
+    finally:
+        storage.connect = real_connect
+        storage.get_pool().close()
+
+    print(f"plans: {checked} distinct statements checked, {violations} with scans or temp sorts")
+    if violations == 0:
+        print("OK: all hot paths use indexes")
+    return violations
+
+
+# =========================================================
+# CACHE: per-user read models
+# =========================================================
+
+def bench_cache(users: int, ops: int) -> None:
+    import accounts
+    import cache
+    import cards
+
+    names = list(cards.starter_decks())
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        for u in range(users):
+            accounts.register_user(f"cache{u}", "cache1234", names[u % len(names)])
+        uids = [accounts.login_user(f"cache{u}", "cache1234")["user_id"] for u in range(users)]
+
+        def page_load(uid: int) -> None:
+            # what one Streamlit rerun of the collection / deck tabs reads
+            accounts.get_collection(uid)
+            accounts.get_deck(uid)
+            accounts.get_deck_name(uid)
+
+        rng = random.Random(0)
+        picks = [rng.choice(uids) for _ in range(ops)]
+
+        for label, ttl in (("uncached (ttl 0)", 0.0), ("cached", accounts.USER_CACHE_TTL_S)):
+            for c in (accounts.COLLECTIONS, accounts.DECKS):
+                c.clear()
+                c.ttl_s = ttl
+                c.hits = c.misses = c.evictions = c.invalidations = 0
+            lat: List[float] = []
+            t0 = time.perf_counter()
+            for n, uid in enumerate(picks):
+                if n % 50 == 0:
+                    accounts.buy_open_booster(uid, "feuer")  # a write that must invalidate
+                t1 = time.perf_counter()
+                page_load(uid)
+                lat.append(time.perf_counter() - t1)
+                assert accounts.get_collection(uid) == accounts._read_collection(uid), "stale collection"
+            elapsed = time.perf_counter() - t0
+            print(f"{label:<18} {ops / elapsed:>8.0f} page loads/s  p50 {percentile(lat, 50) * 1e6:>7.1f} us  "
+                  f"p99 {percentile(lat, 99) * 1e6:>7.1f} us")
+        for st in cache.cache_stats():
+            print(f"  {st['name']:<11} hits {st['hits']:>6}  misses {st['misses']:>6}  "
+                  f"hit rate {st['hit_rate']:.1%}  invalidations {st['invalidations']}")
+        storage.get_pool().close()
+
+
+def bench_match_cache(rooms: int, actions: int) -> None:
+    """Rooms played in parallel, one Duell rerun (load + action) per step, with and without ActiveMatches."""
+    import match_store
+
+    def play(room: str, seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(actions):
+            state = match_store.match_load(room)
+            uid = int(state["active_player"])
+            hand = state["players"][str(uid)]["hand"]
+            if state["phase"] == "planung" and hand and rng.random() < 0.6:
+                match_store.match_assign(room, uid, rng.randint(0, 1), rng.choice(hand))
+            else:
+                match_store.match_advance_phase(room, uid)
+
+    for label, active in (("sqlite only", None), ("active cache", match_store.ActiveMatches())):
+        with tempfile.TemporaryDirectory() as tmp:
+            use_temp_db(tmp)
+            match_store.set_active_matches(active)
+            codes = [f"MC{r}" for r in range(rooms)]
+            for r, code in enumerate(codes):
+                seed_match(code, 2 * r + 1, 2 * r + 2)
+
+            t0 = time.perf_counter()
+            ts = [threading.Thread(target=play, args=(code, r)) for r, code in enumerate(codes)]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+            elapsed = time.perf_counter() - t0
+
+            cached = [match_store.match_load(code) for code in codes]
+            if active is not None:
+                # simulated crash: forget the cache without flushing, rebuild from SQLite
+                match_store._ACTIVE = None
+                for code, state in zip(codes, cached):
+                    assert match_store.match_load(code) == state, "cached state diverges from SQLite"
+                st = active.stats()
+                extra = f"  hit rate {st['hit_rate']:.1%}  snapshot flushes {st['snapshot_flushes']}"
+            else:
+                extra = ""
+            print(f"{label:<13} {rooms * actions / elapsed:>8.0f} actions/s total  "
+                  f"{actions / elapsed:>7.0f} actions/s per room{extra}")
+            storage.get_pool().close()
+    match_store.set_active_matches(match_store.ActiveMatches())
+    print("OK: state rebuilt from events matches the cache after a simulated crash")
+
+
+# =========================================================
+# SPLIT: match and account traffic, one file vs. separate files
+# =========================================================
+
+def _split_worker(job: Tuple[str, str, str, int, int, int]) -> Tuple[str, List[float], float, float]:
+    # runs in its own process: the GIL would otherwise hide the lock contention
+    kind, db_path, match_path, shards, key, ops = job
+    import accounts
+    import match_store
+
+    storage.DB_PATH, storage.MATCH_DB_PATH, storage.MATCH_SHARDS = db_path, match_path, shards
+    rng = random.Random(key)
+    lat: List[float] = []
+    started = time.time()
+    for _ in range(ops):
+        t0 = time.perf_counter()
+        if kind == "match":
+            room = f"SP{key}"
+            state = match_store.match_load(room)
+            uid = int(state["active_player"])
+            hand = state["players"][str(uid)]["hand"]
+            if state["phase"] == "planung" and hand and rng.random() < 0.6:
+                match_store.match_assign(room, uid, rng.randint(0, 1), rng.choice(hand))
+            else:
+                match_store.match_advance_phase(room, uid)
+        else:
+            accounts.buy_open_booster(key, "feuer")
+        lat.append(time.perf_counter() - t0)
+    return kind, lat, started, time.time()
+
+
+def bench_split(rooms: int, buyers: int, ops: int) -> None:
+    """Match actions and booster purchases from separate processes at once, per storage layout."""
+    import multiprocessing
+
+    layouts = (("one file", "", 1), ("match file", "matches.sqlite3", 1),
+               ("match shards x4", "matches.sqlite3", 4))
+    for label, match_file, shards in layouts:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage.MATCH_DB_PATH = os.path.join(tmp, match_file) if match_file else ""
+            storage.MATCH_SHARDS = shards
+            use_temp_db(tmp)
+            for r in range(rooms):
+                seed_match(f"SP{r}", 2 * r + 1, 2 * r + 2)
+            buyer_ids = list(range(1000, 1000 + buyers))
+            with storage.db() as con:
+                con.executemany(
+                    "INSERT INTO users(id, username, password, coins) VALUES (?, ?, 'x', ?)",
+                    [(uid, f"buyer{uid}", 10 ** 9) for uid in buyer_ids],
+                )
+            for path in storage.db_paths():
+                storage.get_pool(path).close()
+
+            jobs = [("match", storage.DB_PATH, storage.MATCH_DB_PATH, shards, r, ops) for r in range(rooms)]
+            jobs += [("booster", storage.DB_PATH, storage.MATCH_DB_PATH, shards, uid, ops) for uid in buyer_ids]
+            with multiprocessing.get_context("spawn").Pool(len(jobs)) as pool:
+                results = pool.map(_split_worker, jobs)
+
+            row = []
+            for kind in ("match", "booster"):
+                mine = [r for r in results if r[0] == kind]
+                lat = [x for r in mine for x in r[1]]
+                done = max(r[3] for r in mine) - min(r[2] for r in mine)
+                row.append(f"{kind} {len(lat) / done:>6.0f}/s p99 {percentile(lat, 99) * 1000:>6.2f} ms")
+            print(f"{label:<16} " + "   ".join(row) + f"   files {len(storage.db_paths())}")
+    storage.MATCH_DB_PATH, storage.MATCH_SHARDS = "", 1
+
+
+# =========================================================
+# ART: page render with full-size art vs. thumbnail cache
+# =========================================================
+
+def bench_art(renders: int) -> None:
+    """Render every card of a full collection the way the tabs do, before and after art.py."""
+    import io
+
+    from PIL import Image
+
+    import art
+    import cards
+
+    # (kind, code, width) of one rerun of Sammlung + Deck-Editor + Duell with a full collection
+    page = ([("vehicles", c, 280) for c in cards.CATALOG] + [("vehicles", c, 360) for c in cards.CATALOG]
+            + [("incidents", i.code, 320) for i in cards.INCIDENTS[:2]] + [("vehicles", next(iter(cards.CATALOG)), 360)])
+
+    def st_image_path(path: str, width: int) -> bytes:
+        # roughly what st.image(path, width=w) does on every call: decode, resize, re-encode
+        with Image.open(path) as im:
+            im = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+            buf = io.BytesIO()
+            im.save(buf, format="PNG")
+            return buf.getvalue()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        art.ART_ROOT = os.path.join(tmp, "cards")
+        art.THUMB_DIR = os.path.join(tmp, "thumbs")
+        for kind, code, _ in page:
+            os.makedirs(os.path.join(art.ART_ROOT, kind), exist_ok=True)
+            im = Image.linear_gradient("L").resize((1024, 1434)).convert("RGB")
+            im.save(os.path.join(art.ART_ROOT, kind, f"{code}.png"))
+        art.refresh_index()
+
+        before: List[float] = []
+        for _ in range(renders):
+            t0 = time.perf_counter()
+            sent = 0
+            for kind, code, width in page:
+                path = os.path.join(art.ART_ROOT, kind, f"{code}.png")
+                if os.path.exists(path):
+                    sent += len(st_image_path(path, width))
+            before.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        built = art.build_thumbnails()
+        t_build = time.perf_counter() - t0
+        art.THUMBS.clear()
+        art.refresh_index()
+
+        after: List[float] = []
+        for _ in range(renders):
+            t0 = time.perf_counter()
+            for kind, code, width in page:
+                art.thumbnail(kind, code, width)
+            after.append(time.perf_counter() - t0)
+
+        print(f"art: {len(page)} images per page render, {renders} renders, 1024x1434 source art")
+        print(f"stat + resize per render (before)  p50 {percentile(before, 50) * 1000:>8.2f} ms  "
+              f"p99 {percentile(before, 99) * 1000:>8.2f} ms")
+        print(f"index + cached thumbnails (after)  p50 {percentile(after, 50) * 1000:>8.2f} ms  "
+              f"p99 {percentile(after, 99) * 1000:>8.2f} ms  (first render loads thumbs from disk)")
+        print(f"pre-generating {built} thumbnails took {t_build:.2f}s; "
+              f"art cache {art.THUMBS.stats()['hits']} hits / {art.THUMBS.stats()['misses']} misses")
+
+
+# =========================================================
+# API: in-process load test of server.py
+# =========================================================
+
+def load_api(pairs: int, actions: int) -> None:
+    """Each thread registers two players, opens a room and plays a match over HTTP."""
+    from fastapi.testclient import TestClient
+
+    import cards
+    import server
+
+    deck_names = list(cards.starter_decks())
+    lat: Dict[str, List[float]] = {}
+    lat_lock = threading.Lock()
+
+    def call(client, name: str, method: str, url: str, token: str = "", **kw):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        t0 = time.perf_counter()
+        r = client.request(method, url, headers=headers, **kw)
+        dt = time.perf_counter() - t0
+        with lat_lock:
+            lat.setdefault(name, []).append(dt)
+        return r
+
+    def player(client, i: int, seat: int) -> str:
+        name = f"load{i}_{seat}"
+        call(client, "register", "POST", "/register",
+             json={"username": name, "password": "load1234", "starter_deck": deck_names[seat % len(deck_names)]})
+        r = call(client, "login", "POST", "/login", json={"username": name, "password": "load1234"})
+        return r.json()["token"]
+
+    def worker(client, i: int) -> None:
+        rng = random.Random(i)
+        t1, t2 = player(client, i, 0), player(client, i, 1)
+        code = f"LOAD{i}"
+        call(client, "room create", "POST", "/rooms", t1, json={"code": code})
+        call(client, "room join", "POST", f"/rooms/{code}/join", t2)
+        assert call(client, "match start", "POST", f"/rooms/{code}/start", t1).status_code == 200
+        tokens = {str(call(client, "me", "GET", "/me", t).json()["user_id"]): t for t in (t1, t2)}
+        for _ in range(actions):
+            state = call(client, "match get", "GET", f"/matches/{code}", t1).json()
+            active = str(state["active_player"])
+            token = tokens[active]
+            hand = call(client, "match get", "GET", f"/matches/{code}", token).json()["players"][active]["hand"]
+            if state["phase"] == "planung" and hand and rng.random() < 0.5:
+                call(client, "match assign", "POST", f"/matches/{code}/assign", token,
+                     json={"slot": rng.randint(0, 1), "card_code": rng.choice(hand)})
+            else:
+                call(client, "match advance", "POST", f"/matches/{code}/advance", token)
+        call(client, "collection", "GET", "/collection", t1)
+        call(client, "booster", "POST", "/boosters/feuer", t2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+        with TestClient(server.app) as client:
+            t0 = time.perf_counter()
+            ts = [threading.Thread(target=worker, args=(client, i)) for i in range(pairs)]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+            elapsed = time.perf_counter() - t0
+        storage.get_pool().close()
+
+    total = sum(len(v) for v in lat.values())
+    print(f"api: {pairs} matches x {actions} actions, {total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    for name, samples in sorted(lat.items()):
+        print(f"{name:<16} {len(samples):>7} req  p50 {percentile(samples, 50) * 1000:>7.2f} ms  "
+              f"p99 {percentile(samples, 99) * 1000:>7.2f} ms")
+
+
+# =========================================================
+# DELTA: patch round-trips and sizes
+# =========================================================
+
+def _random_json(rng: random.Random, depth: int = 0):
+    roll = rng.random()
+    if depth > 3 or roll < 0.4:
+        return rng.choice([rng.randint(-5, 5), f"s{rng.randint(0, 9)}", None, True])
+    if roll < 0.7:
+        return [_random_json(rng, depth + 1) for _ in range(rng.randint(0, 5))]
+    return {f"k{rng.randint(0, 6)}": _random_json(rng, depth + 1) for _ in range(rng.randint(0, 5))}
+
+
+def _mutate(rng: random.Random, value):
+    if isinstance(value, dict) and value and rng.random() < 0.8:
+        k = rng.choice(list(value))
+        out = dict(value)
+        roll = rng.random()
+        if roll < 0.2:
+            del out[k]
+        elif roll < 0.4:
+            out[f"n{rng.randint(0, 9)}"] = _random_json(rng, 2)
+        else:
+            out[k] = _mutate(rng, value[k])
+        return out
+    if isinstance(value, list) and rng.random() < 0.8:
+        out = list(value)
+        roll = rng.random()
+        if roll < 0.3 and out:
+            del out[rng.randrange(len(out))]
+        elif roll < 0.6:
+            out.insert(rng.randint(0, len(out)), _random_json(rng, 2))
+        elif out:
+            i = rng.randrange(len(out))
+            out[i] = _mutate(rng, out[i])
+        return out
+    if type(value) in (bool, int) and rng.random() < 0.3:
+        # same value, other type (True -> 1, 1 -> 1.0): == cannot tell them apart
+        return int(value) if type(value) is bool else float(value)
+    return _random_json(rng, 1)
+
+
+def _recording(draw: Callable[[], dict], codes: List[str]) -> Callable[[], dict]:
+    def recording() -> dict:
+        inc = draw()
+        codes.append(inc["code"])
+        return inc
+    return recording
+
+
+def bot_game_events(games: int, seeded: bool = False) -> Iterator[Tuple[dict, str, dict]]:
+    """(state, kind, payload) for every action of seeded GreedyBot games; state is before the event.
+
+    Each state carries only the log lines of the previous event, like a published one.
+    ``seeded`` plays them as live matches do: match seed g, no incidents in the events.
+    """
+    import bots
+    import cards
+    import duel
+
+    decks = [cards.deck_to_list(d) for d in cards.starter_decks().values()]
+    for g in range(games):
+        rng = random.Random(g)
+        draw = duel.rng_draw(rng)
+        d1, d2 = list(decks[0]), list(decks[1])
+        if seeded:
+            state = duel.new_match_state(1, 2, d1, d2, seed=g)
+        else:
+            rng.shuffle(d1)
+            rng.shuffle(d2)
+            state = duel.new_match_state(1, 2, d1, d2, draw)
+        bot = bots.GreedyBot()
+        while int(state["round_no"]) <= 12:
+            uid = int(state["active_player"])
+            move = bot.choose(state, uid, rng) if state["phase"] == "planung" else None
+            if move is not None:
+                kind, payload = "assign", {"user_id": uid, "slot": move[0], "card_code": move[1]}
+            elif seeded:
+                kind, payload = "advance", {"user_id": uid}
+            else:
+                # roll the incidents once, then replay them through the event like match_store does
+                codes: List[str] = []
+                duel.advance_phase(duel.clone_state(state), uid, _recording(draw, codes))
+                kind, payload = "advance", {"user_id": uid, "incidents": codes}
+            yield state, kind, payload
+            new = duel.apply_event(duel.clone_state(state), kind, payload)
+            state = new
+
+
+def bench_delta(games: int, fuzz: int) -> None:
+    import json
+
+    import delta
+
+    def roundtrip(old, new) -> int:
+        ops = json.loads(json.dumps(delta.diff(old, new)))  # what actually crosses the wire
+        got = delta.apply(json.loads(json.dumps(old)), ops)
+        # compared as JSON text: == would accept True for 1 or 1.0 for 1
+        same = json.dumps(got, sort_keys=True) == json.dumps(new, sort_keys=True)
+        assert same, f"round-trip failed: {old!r} -> {new!r}"
+        return len(ops)
+
+    rng = random.Random(1)
+    for _ in range(fuzz):
+        a = _random_json(rng)
+        b = a
+        for _ in range(rng.randint(1, 4)):
+            b = _mutate(rng, b)
+        roundtrip(a, b)
+    print(f"delta fuzz: {fuzz} random JSON pairs round-trip OK")
+
+    full_bytes: List[int] = []
+    patch_bytes: List[int] = []
+    t_diff = 0.0
+    t_apply = 0.0
+    for state, kind, payload in bot_game_events(games):
+        t0 = time.perf_counter()
+        new, ops = delta.action_patch(state, kind, payload)
+        t_diff += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rebuilt = delta.apply(json.loads(json.dumps(state)), json.loads(json.dumps(ops)))
+        t_apply += time.perf_counter() - t0
+        assert rebuilt == new, "match patch round-trip failed"
+        full_bytes.append(len(json.dumps(new)))
+        patch_bytes.append(len(json.dumps(ops)))
+
+    n = len(full_bytes)
+    print(f"delta match: {games} games, {n} actions, every patch round-trips")
+    print(f"full json.dumps   avg {sum(full_bytes) / n:>8.0f} B  p99 {percentile(full_bytes, 99):>6.0f} B  "
+          f"total {sum(full_bytes) / 1024:>8.0f} KiB")
+    print(f"delta patch       avg {sum(patch_bytes) / n:>8.0f} B  p99 {percentile(patch_bytes, 99):>6.0f} B  "
+          f"total {sum(patch_bytes) / 1024:>8.0f} KiB  ({sum(full_bytes) / max(1, sum(patch_bytes)):.1f}x smaller)")
+    print(f"diff+clone {t_diff / n * 1e6:.1f} us/action   apply {t_apply / n * 1e6:.1f} us/action (incl. JSON copies)")
+
+
+# =========================================================
+# CODEC: binary vs. JSON state encoding
+# =========================================================
+
+def bench_codec(games: int) -> None:
+    import json
+
+    import codec
+
+    states = [state for state, _, _ in bot_game_events(games)]
+    for s in states:
+        assert codec.loads(codec.dumps(s)) == s, "codec round-trip failed"
+
+    def measure(label: str, enc: Callable[[dict], bytes], dec: Callable[[bytes], dict]) -> None:
+        t0 = time.perf_counter()
+        blobs = [enc(s) for s in states]
+        t_enc = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for b in blobs:
+            dec(b)
+        t_dec = time.perf_counter() - t0
+        sizes = [len(b) for b in blobs]
+        n = len(states)
+        print(f"{label:<14} avg {sum(sizes) / n:>7.0f} B  p99 {percentile(sizes, 99):>6.0f} B  "
+              f"encode {t_enc / n * 1e6:>6.1f} us  decode {t_dec / n * 1e6:>6.1f} us")
+
+    print(f"codec: {len(states)} states from {games} bot games, all round-trip")
+    measure("json", lambda s: json.dumps(s).encode("utf-8"), json.loads)
+    measure("json compact", lambda s: json.dumps(s, separators=(",", ":")).encode("utf-8"), json.loads)
+    measure("binary", codec.dumps, codec.loads)
+
+
+# =========================================================
+# SEED: per-match RNG, compact storage and cross-process replays
+# =========================================================
+
+def _seeded_final_state(games: int) -> List[str]:
+    # runs in a fresh process (own PYTHONHASHSEED); returns the final states as JSON
+    import json
+
+    import duel
+
+    finals: Dict[int, dict] = {}
+    for state, kind, payload in bot_game_events(games, seeded=True):
+        finals[int(state["rng"]["seed"])] = duel.apply_event(duel.clone_state(state), kind, payload)
+    return [json.dumps(finals[k], sort_keys=True) for k in sorted(finals)]
+
+
+def bench_seed(games: int) -> None:
+    import json
+    import multiprocessing
+
+    import duel
+
+    full_bytes, compact_bytes = [], []
+    t_compact = t_expand = 0.0
+    for state, kind, payload in bot_game_events(games, seeded=True):
+        t0 = time.perf_counter()
+        compact = json.dumps(duel.compact_state(state))
+        t_compact += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        restored = duel.expand_state(json.loads(compact))
+        t_expand += time.perf_counter() - t0
+        assert restored == json.loads(json.dumps(state)), "compact state does not expand to the original"
+        full_bytes.append(len(json.dumps(state)))
+        compact_bytes.append(len(compact))
+    n = len(full_bytes)
+    print(f"seed: {n} states from {games} seeded bot games, all expand to the original")
+    print(f"stored state  full avg {sum(full_bytes) / n:>6.0f} B   compact avg {sum(compact_bytes) / n:>6.0f} B   "
+          f"({sum(full_bytes) / max(1, sum(compact_bytes)):.2f}x smaller)")
+    print(f"compact {t_compact / n * 1e6:.1f} us/state   expand {t_expand / n * 1e6:.1f} us/state")
+
+    # the same seeds must give the same matches in another interpreter
+    local = _seeded_final_state(games)
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        remote = pool.apply(_seeded_final_state, (games,))
+    assert local == remote, "seeded matches differ between processes"
+    print("OK: seeded matches replay identically in a separate process")
+
+
+# =========================================================
+# DRAW ODDS
+# =========================================================
+
+def _random_deck(rng: random.Random, size: int) -> Dict[str, int]:
+    from cards import CATALOG
+
+    deck: Dict[str, int] = {}
+    for code in rng.choices(sorted(CATALOG), k=size):
+        deck[code] = deck.get(code, 0) + 1
+    return deck
+
+
+def bench_odds(decks: int, small: int) -> None:
+    import itertools
+    from math import comb
+
+    import analytics
+    from cards import INCIDENTS, deck_to_list, req_vector
+    from duel import HAND_SIZE, MAX_EP
+
+    rng = random.Random(7)
+    # exact check: decks small enough to enumerate every hand
+    checked = 0
+    for _ in range(small):
+        deck = _random_deck(rng, rng.randint(HAND_SIZE, HAND_SIZE + 5))
+        budget = rng.randint(2, MAX_EP)
+        cards = deck_to_list(deck)
+        for inc, odds in zip(INCIDENTS, analytics.draw_odds(deck, budget)):
+            req = req_vector(inc.req)
+            for n, p in zip(odds.hand_sizes, odds.p):
+                hits = sum(analytics.hand_answers(list(h), req, budget) for h in itertools.combinations(cards, n))
+                exact = hits / comb(len(cards), n)
+                assert abs(p - exact) < 1e-12, f"{inc.code} hand {n}: {p} != {exact} for {deck} (EP {budget})"
+                checked += 1
+    print(f"odds: {checked} values on {small} small decks match full hand enumeration")
+
+    # live update in the Deck-Editor: a fresh 40-card deck per edit, worst case EP budget
+    lat = []
+    for _ in range(decks):
+        deck = _random_deck(rng, 40)
+        t0 = time.perf_counter()
+        analytics.draw_odds(deck, MAX_EP)
+        lat.append(time.perf_counter() - t0)
+    print(f"40-card decks, EP {MAX_EP}: p50 {percentile(lat, 50) * 1000:.1f} ms  "
+          f"p99 {percentile(lat, 99) * 1000:.1f} ms  max {max(lat) * 1000:.1f} ms")
+    t0 = time.perf_counter()
+    analytics.draw_odds(deck, MAX_EP)
+    print(f"same deck again (memoized): {(time.perf_counter() - t0) * 1e6:.1f} us")
+    assert max(lat) < 1.0, "draw odds too slow for a live update"
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_db = sub.add_parser("db", help="per-call connect vs. connection pool")
+    p_db.add_argument("--ops", type=int, default=5000)
+    p_db.add_argument("--threads", type=int, default=4)
+
+    p_ms = sub.add_parser("match-stress", help="hammer one room from many threads, assert no lost updates")
+    p_ms.add_argument("--threads", type=int, default=8)
+    p_ms.add_argument("--actions", type=int, default=400)
+
+    p_bs = sub.add_parser("booster-stress", help="concurrent booster purchases, assert no double spend")
+    p_bs.add_argument("--threads", type=int, default=16)
+    p_bs.add_argument("--attempts", type=int, default=20)
+
+    sub.add_parser("plans", help="EXPLAIN QUERY PLAN every app query, fail on table scans")
+
+    p_dl = sub.add_parser("delta", help="patch round-trip checks and patch size vs. full state")
+    p_dl.add_argument("--games", type=int, default=50)
+    p_dl.add_argument("--fuzz", type=int, default=2000)
+
+    p_cd = sub.add_parser("codec", help="binary state encoding vs. JSON: bytes and speed")
+    p_cd.add_argument("--games", type=int, default=50)
+
+    p_ca = sub.add_parser("cache", help="per-user read models with and without the process cache")
+    p_ca.add_argument("--users", type=int, default=200)
+    p_ca.add_argument("--ops", type=int, default=20000)
+
+    p_mc = sub.add_parser("match-cache", help="actions/s per room with and without the active-match cache")
+    p_mc.add_argument("--rooms", type=int, default=4)
+    p_mc.add_argument("--actions", type=int, default=500)
+    p_sp = sub.add_parser("split", help="concurrent match + booster traffic per storage layout")
+    p_sp.add_argument("--rooms", type=int, default=4)
+    p_sp.add_argument("--buyers", type=int, default=4)
+    p_sp.add_argument("--ops", type=int, default=300)
+    p_sd = sub.add_parser("seed", help="compact seeded states and cross-process replay check")
+    p_sd.add_argument("--games", type=int, default=30)
+    p_art = sub.add_parser("art", help="page render time with full-size art vs. cached thumbnails")
+    p_art.add_argument("--renders", type=int, default=20)
+    p_od = sub.add_parser("odds", help="exact draw odds: check against full enumeration, time per deck")
+    p_od.add_argument("--decks", type=int, default=50)
+    p_od.add_argument("--small", type=int, default=20)
+
+    p_api = sub.add_parser("api", help="in-process load test of the HTTP API")
+    p_api.add_argument("--pairs", type=int, default=8)
+    p_api.add_argument("--actions", type=int, default=100)
+
+    args = ap.parse_args()
+    if args.cmd == "db":
+        bench_db(args.ops, args.threads)
+    elif args.cmd == "match-stress":
+        stress_match(args.threads, args.actions)
+    elif args.cmd == "booster-stress":
+        stress_booster(args.threads, args.attempts)
+    elif args.cmd == "plans":
+        raise SystemExit(1 if check_plans() else 0)
+    elif args.cmd == "delta":
+        bench_delta(args.games, args.fuzz)
+    elif args.cmd == "codec":
+        bench_codec(args.games)
+    elif args.cmd == "cache":
+        bench_cache(args.users, args.ops)
+    elif args.cmd == "match-cache":
+        bench_match_cache(args.rooms, args.actions)
+    elif args.cmd == "split":
+        bench_split(args.rooms, args.buyers, args.ops)
+    elif args.cmd == "seed":
+        bench_seed(args.games)
+    elif args.cmd == "art":
+        bench_art(args.renders)
+    elif args.cmd == "odds":
+        bench_odds(args.decks, args.small)
+    elif args.cmd == "api":
+        load_api(args.pairs, args.actions)
+
+
+if __name__ == "__main__":
+    main()
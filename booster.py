@@ -0,0 +1,94 @@
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cards import CATALOG, VehicleCard
+
+# Booster sampling. Per (theme, rarity) pools and their Walker alias tables are built
+# once at import, so every card pull is O(1) instead of rebuilding pool + weights.
+
+THEMES = ["feuer", "rd", "thl"]
+RARITIES = ["C", "U", "R"]
+PACK_SIZE = 5
+
+
+# =========================================================
+# ALIAS TABLE
+# =========================================================
+
+class AliasTable:
+    """Walker/Vose alias method: O(n) build, O(1) weighted sample."""
+
+    def __init__(self, items: Sequence, weights: Sequence[float]):
+        n = len(items)
+        if n == 0:
+            raise RuntimeError("Leerer Pool.")
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] = scaled[g] + scaled[s] - 1.0
+            (small if scaled[g] < 1.0 else large).append(g)
+        for i in large + small:  # leftovers are 1.0 up to rounding
+            prob[i] = 1.0
+        self.items = list(items)
+        self.prob = prob
+        self.alias = alias
+
+    def sample(self, rng=random):
+        u = rng.random() * len(self.items)
+        i = int(u)
+        return self.items[i] if (u - i) < self.prob[i] else self.items[self.alias[i]]
+
+
+def _build_pools() -> Dict[Tuple[str, str], AliasTable]:
+    pools = {}
+    for theme in THEMES:
+        themed = [c for c in CATALOG.values() if c.theme == theme]
+        for rarity in RARITIES:
+            pool = [c for c in themed if c.rarity == rarity] or themed
+            pools[(theme, rarity)] = AliasTable(pool, [max(1, int(c.weight)) for c in pool])
+    return pools
+
+
+POOLS = _build_pools()
+
+
+# =========================================================
+# PACKS
+# =========================================================
+
+def roll_rarity_for_slot(slot: int, rng=random) -> str:
+    if slot < 4:
+        return "C"
+    return "R" if rng.random() < 0.20 else "U"
+
+
+def pick_card(theme: str, rarity: str, rng=random) -> VehicleCard:
+    return POOLS[(theme, rarity)].sample(rng)
+
+
+def open_booster(theme: str, rng=random) -> List[VehicleCard]:
+    return [pick_card(theme, roll_rarity_for_slot(i, rng), rng) for i in range(PACK_SIZE)]
+
+
+def open_boosters(theme: str, n: int, rng: Optional[random.Random] = None) -> List[List[VehicleCard]]:
+    """Open ``n`` packs in one call (event grants); pass a seeded rng for reproducible drops."""
+    if (theme, "C") not in POOLS:
+        raise RuntimeError(f"Ungültiges Booster-Theme: {theme}")
+    rng = rng or random
+    commons = POOLS[(theme, "C")]
+    uncommons = POOLS[(theme, "U")]
+    rares = POOLS[(theme, "R")]
+    packs = []
+    for _ in range(int(n)):
+        pack = [commons.sample(rng) for _ in range(PACK_SIZE - 1)]
+        pack.append((rares if rng.random() < 0.20 else uncommons).sample(rng))
+        packs.append(pack)
+    return packs
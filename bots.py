@@ -0,0 +1,155 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+import duel
+from cards import CATALOG, req_vector
+
+# Bot players for simulations and single-player matches. Bots only read the state;
+# the chosen move is applied through duel.assign_card like a human move.
+
+Move = Tuple[int, str]  # (slot, card_code)
+
+
+# =========================================================
+# MOVE GENERATOR
+# =========================================================
+
+def legal_moves(state: dict, user_id: int) -> List[Move]:
+    """All (slot, card_code) pairs duel.assign_card would accept, without touching the state."""
+    if state["phase"] != "planung" or int(state["active_player"]) != int(user_id):
+        return []
+    uid = str(user_id)
+    if state["assigned_this_turn"].get(uid, False):
+        return []
+
+    p = state["players"][uid]
+    ep = int(p["ep"])
+    crew = int(p["crew"])
+    moves: List[Move] = []
+    for code in set(p["hand"]):
+        card = CATALOG.get(code)
+        if not card or ep < duel.assign_cost(state, card) or crew < int(card.crew):
+            continue
+        moves.append((0, code))
+        moves.append((1, code))
+    moves.sort()  # set order is not stable across processes; keep seeded runs reproducible
+    return moves
+
+
+def slot_totals(state: dict, slot: int) -> List[int]:
+    return list(duel.slot_state(state, slot)["totals"])
+
+
+def deficit(req: Tuple[int, ...], totals: List[int]) -> int:
+    return sum(max(0, r - t) for r, t in zip(req, totals))
+
+
+def move_value(state: dict, move: Move, totals: Dict[int, List[int]]) -> float:
+    slot, code = move
+    card = CATALOG[code]
+    inc = state["open_incidents"][slot]
+    req = req_vector(inc["req"])
+    before = deficit(req, totals[slot])
+    after = deficit(req, [t + v for t, v in zip(totals[slot], card.vec)])
+
+    value = float(before - after)
+    if before > 0 and after == 0:
+        value += 10.0 * int(inc["ew"])
+    return value - 0.1 * duel.assign_cost(state, card)
+
+
+# =========================================================
+# POLICIES
+# =========================================================
+
+class RandomBot:
+    name = "random"
+
+    def choose(self, state: dict, user_id: int, rng: random.Random) -> Optional[Move]:
+        moves = legal_moves(state, user_id)
+        return rng.choice(moves) if moves else None
+
+
+class GreedyBot:
+    """Picks the move that closes the most requirement deficit, preferring completed incidents."""
+    name = "greedy"
+
+    def choose(self, state: dict, user_id: int, rng: random.Random) -> Optional[Move]:
+        moves = legal_moves(state, user_id)
+        if not moves:
+            return None
+        totals = {0: slot_totals(state, 0), 1: slot_totals(state, 1)}
+        best = max(move_value(state, m, totals) for m in moves)
+        return rng.choice([m for m in moves if move_value(state, m, totals) == best])
+
+
+class MonteCarloBot:
+    """Scores every legal move (and passing) by random rollouts over the next few turns."""
+    name = "mc"
+
+    def __init__(self, rollouts: int = 8, horizon_turns: int = 4, rollout_bot=None):
+        self.rollouts = rollouts
+        self.horizon_turns = horizon_turns
+        self.rollout_bot = rollout_bot or RandomBot()
+
+    def choose(self, state: dict, user_id: int, rng: random.Random) -> Optional[Move]:
+        moves: List[Optional[Move]] = list(legal_moves(state, user_id))
+        if not moves:
+            return None
+        moves.append(None)  # passing is a legal choice too
+
+        uid = str(user_id)
+        other = next(k for k in state["players"] if k != uid)
+        draw = duel.rng_draw(rng)
+        best_move, best_score = None, float("-inf")
+        for move in moves:
+            score = 0.0
+            for _ in range(self.rollouts):
+                s = duel.clone_state(state)
+                self._determinize(s, uid, rng)
+                if move is not None:
+                    duel.assign_card(s, user_id, move[0], move[1])
+                self._rollout(s, rng, draw)
+                score += int(s["players"][uid]["ew"]) - int(s["players"][other]["ew"])
+            if score > best_score:
+                best_move, best_score = move, score
+        return best_move
+
+    @staticmethod
+    def _determinize(s: dict, uid: str, rng: random.Random) -> None:
+        # the bot sees what player_view shows: its own hand, not the order of its pile
+        # nor the opponent's cards (nor the seed); rollouts play one random deal of the unknown cards
+        s.pop("rng", None)
+        for k, p in s["players"].items():
+            if k == uid:
+                rng.shuffle(p["draw_pile"])
+            else:
+                unknown = p["hand"] + p["draw_pile"]
+                rng.shuffle(unknown)
+                n = len(p["hand"])
+                p["hand"], p["draw_pile"] = unknown[:n], unknown[n:]
+
+    def _rollout(self, s: dict, rng: random.Random, draw: duel.IncidentDraw) -> None:
+        turns = 0
+        while turns < self.horizon_turns:
+            uid = int(s["active_player"])
+            if s["phase"] == "planung" and not s["assigned_this_turn"].get(str(uid), False):
+                m = self.rollout_bot.choose(s, uid, rng)
+                if m is not None:
+                    duel.assign_card(s, uid, m[0], m[1])
+            if s["phase"] == "eskalation":
+                turns += 1
+            duel.advance_phase(s, uid, draw)
+
+
+BOTS = {
+    "random": RandomBot,
+    "greedy": GreedyBot,
+    "mc": MonteCarloBot,
+}
+
+
+def make_bot(name: str):
+    if name not in BOTS:
+        raise RuntimeError(f"Unbekannter Bot: {name}")
+    return BOTS[name]()
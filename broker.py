@@ -0,0 +1,79 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Pub/sub for match updates, one channel per room code. match_store publishes after
+# every committed action; the websocket endpoint and the Streamlit Duell tab listen.
+#
+# The default broker only reaches subscribers in the same process. A multi-worker
+# deployment swaps in a shared one (e.g. Redis pub/sub) via set_broker(); anything
+# with publish/subscribe/version works.
+
+Callback = Callable[[dict], None]
+Unsubscribe = Callable[[], None]
+
+
+class InProcessBroker:
+    """Thread-safe fan-out to callbacks registered in this process.
+
+    Callbacks run on the publishing thread and must not block; hand the message
+    to a queue or event loop instead.
+    """
+
+    def __init__(self):
+        self._subs: Dict[str, List[Callback]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: dict) -> None:
+        with self._lock:
+            self._versions[channel] = int(message.get("version", self._versions.get(channel, 0) + 1))
+            subs = list(self._subs.get(channel, ()))
+        for cb in subs:
+            try:
+                cb(message)
+            except Exception:
+                # a dead listener must not fail the write that published
+                self._remove(channel, cb)
+
+    def subscribe(self, channel: str, callback: Callback) -> Unsubscribe:
+        with self._lock:
+            self._subs.setdefault(channel, []).append(callback)
+        return lambda: self._remove(channel, callback)
+
+    def version(self, channel: str) -> Optional[int]:
+        """Version of the last message published on the channel, None if nothing was."""
+        with self._lock:
+            return self._versions.get(channel)
+
+    def _remove(self, channel: str, callback: Callback) -> None:
+        with self._lock:
+            subs = self._subs.get(channel, [])
+            if callback in subs:
+                subs.remove(callback)
+            if not subs:
+                self._subs.pop(channel, None)
+
+
+class NullBroker:
+    """Drops every message; for batch jobs and benchmarks that have no listeners."""
+
+    def publish(self, channel: str, message: dict) -> None:
+        pass
+
+    def subscribe(self, channel: str, callback: Callback) -> Unsubscribe:
+        return lambda: None
+
+    def version(self, channel: str) -> Optional[int]:
+        return None
+
+
+_BROKER = InProcessBroker()
+
+
+def get_broker():
+    return _BROKER
+
+
+def set_broker(broker) -> None:
+    global _BROKER
+    _BROKER = broker
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Process-wide read caches. They live at module level, so they survive Streamlit
+# reruns and are shared by all threads of an API worker.
+#
+# Writers invalidate after their transaction commits. Other processes (a second
+# API worker) do not see that invalidation, so the TTL bounds how stale their
+# copy can get.
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl_s`` seconds after being stored."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl_s: float = 30.0):
+        self.name = name
+        self.maxsize = int(maxsize)
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]  # expired
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._put(key, value)
+
+    def _put(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self._generation
+            value = load()
+            with self._lock:
+                # a write committed while we were loading: our value may predate it, don't keep it
+                if generation == self._generation:
+                    self._put(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_CACHES: Dict[str, TTLCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(name: str, maxsize: int = 1024, ttl_s: float = 30.0) -> TTLCache:
+    with _CACHES_LOCK:
+        c = _CACHES.get(name)
+        if c is None:
+            c = TTLCache(name, maxsize, ttl_s)
+            _CACHES[name] = c
+        return c
+
+
+def cache_stats(name: Optional[str] = None) -> List[Dict[str, Any]]:
+    with _CACHES_LOCK:
+        caches = [c for n, c in sorted(_CACHES.items()) if name is None or n == name]
+    return [c.stats() for c in caches]
@@ -0,0 +1,212 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+AXES = ["brand", "technik", "hoehe", "rettung", "koord"]
+AXIS_INDEX = {k: i for i, k in enumerate(AXES)}
+
+StatVec = Tuple[int, ...]  # one int per axis, in AXES order
+
+
+# =========================================================
+# MODELS
+# =========================================================
+
+@dataclass
+class VehicleCard:
+    code: str
+    name: str
+    cost_ep: int
+    crew: int
+    brand: int = 0
+    technik: int = 0
+    hoehe: int = 0
+    rettung: int = 0
+    koord: int = 0
+    rarity: str = "C"
+    theme: str = "feuer"  # feuer | rd | thl
+    weight: int = 10
+    weakness: str = ""
+    art_path: str = ""
+    # precomputed at construction; catalog cards are never mutated afterwards
+    vec: StatVec = field(init=False, repr=False, compare=False)
+    power: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.vec = tuple(int(getattr(self, k)) for k in AXES)
+        self.power = sum(self.vec)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(zip(AXES, self.vec))
+
+
+@dataclass
+class IncidentCard:
+    code: str
+    name: str
+    ew: int
+    time_left: int
+    req: Dict[str, int]
+    tags: List[str]
+    art_path: str = ""
+
+
+# =========================================================
+# CATALOG
+# =========================================================
+
+def vehicle_catalog() -> List[VehicleCard]:
+    # Codes must match your image filenames in assets/cards/vehicles/<CODE>.png
+    return [
+        VehicleCard("V100", "LHF", 3, 1, brand=4, technik=1, weakness="Erste Hilfe", theme="feuer", rarity="C", weight=18,
+                    art_path="assets/cards/vehicles/V100.png"),
+        VehicleCard("V101", "TLF", 4, 1, brand=5, technik=1, weakness="Koordinierung", theme="feuer", rarity="U", weight=10,
+                    art_path="assets/cards/vehicles/V101.png"),
+        VehicleCard("V102", "DLK 23/12", 3, 1, hoehe=4, brand=1, weakness="Technik", theme="feuer", rarity="U", weight=10,
+                    art_path="assets/cards/vehicles/V102.png"),
+        VehicleCard("V103", "SW", 3, 1, brand=2, koord=1, weakness="Gefahrgut", theme="feuer", rarity="C", weight=14,
+                    art_path="assets/cards/vehicles/V103.png"),
+
+        VehicleCard("V104", "Feuerwehrkran", 5, 1, technik=6, weakness="Koordinierung", theme="thl", rarity="R", weight=3,
+                    art_path="assets/cards/vehicles/V104.png"),
+        VehicleCard("V105", "ELW 1", 2, 1, koord=3, weakness="Brand", theme="thl", rarity="C", weight=14,
+                    art_path="assets/cards/vehicles/V105.png"),
+        VehicleCard("V106", "ELW 2", 3, 1, koord=5, weakness="Rettung", theme="thl", rarity="R", weight=3,
+                    art_path="assets/cards/vehicles/V106.png"),
+
+        VehicleCard("V108", "RTW", 2, 1, rettung=3, weakness="Feuer", theme="rd", rarity="C", weight=22,
+                    art_path="assets/cards/vehicles/V108.png"),
+        VehicleCard("V109", "NEF", 2, 1, rettung=2, koord=1, weakness="Technik", theme="rd", rarity="C", weight=18,
+                    art_path="assets/cards/vehicles/V109.png"),
+        VehicleCard("V110", "ITW", 4, 1, rettung=5, weakness="Koordinierung", theme="rd", rarity="U", weight=8,
+                    art_path="assets/cards/vehicles/V110.png"),
+        VehicleCard("V111", "RTH", 4, 1, rettung=4, hoehe=1, weakness="Gefahrgut", theme="rd", rarity="U", weight=8,
+                    art_path="assets/cards/vehicles/V111.png"),
+        VehicleCard("V112", "ITH", 5, 1, rettung=5, hoehe=1, weakness="Brand", theme="rd", rarity="R", weight=3,
+                    art_path="assets/cards/vehicles/V112.png"),
+    ]
+
+
+def incident_catalog() -> List[IncidentCard]:
+    # Codes must match your image filenames in assets/cards/incidents/<CODE>.png
+    return [
+        IncidentCard("E001", "Großbrand", ew=3, time_left=2, req={"brand": 6}, tags=["feuer", "gross"],
+                     art_path="assets/cards/incidents/E001.png"),
+        IncidentCard("E002", "Wohnungsbrand", ew=3, time_left=2, req={"brand": 5}, tags=["feuer"],
+                     art_path="assets/cards/incidents/E002.png"),
+        IncidentCard("E003", "Verkehrsunfall (eingeklemmt)", ew=3, time_left=2, req={"technik": 4}, tags=["thl", "vu"],
+                     art_path="assets/cards/incidents/E003.png"),
+        IncidentCard("E004", "Gefahrgutunfall", ew=4, time_left=2, req={"technik": 3}, tags=["feuer", "gefahrgut"],
+                     art_path="assets/cards/incidents/E004.png"),
+
+        IncidentCard("E101", "Reanimation", ew=3, time_left=2, req={"rettung": 4}, tags=["rd"],
+                     art_path="assets/cards/incidents/E101.png"),
+        IncidentCard("E102", "Polytrauma", ew=4, time_left=2, req={"rettung": 5}, tags=["rd"],
+                     art_path="assets/cards/incidents/E102.png"),
+        IncidentCard("E103", "MANV (klein)", ew=5, time_left=3, req={"rettung": 7, "koord": 3}, tags=["rd", "gross"],
+                     art_path="assets/cards/incidents/E103.png"),
+    ]
+
+
+CATALOG = {c.code: c for c in vehicle_catalog()}
+INCIDENTS = incident_catalog()
+INCIDENT_BY_CODE = {i.code: i for i in INCIDENTS}
+
+# display order of the collection views, plus a lowercase search key per card
+CATALOG_ORDER: List[str] = sorted(CATALOG, key=lambda code: (CATALOG[code].theme, CATALOG[code].name))
+SEARCH_KEY: Dict[str, str] = {code: f"{c.name} {c.code}".lower() for code, c in CATALOG.items()}
+
+
+def filter_codes(codes: Iterable[str], theme: str = "", rarity: str = "", text: str = "") -> List[str]:
+    """Catalog codes among ``codes`` matching the filters, in CATALOG_ORDER. Empty filters match all."""
+    wanted = set(codes)
+    text = text.strip().lower()
+    out = []
+    for code in CATALOG_ORDER:
+        if code not in wanted:
+            continue
+        c = CATALOG[code]
+        if theme and c.theme != theme:
+            continue
+        if rarity and c.rarity != rarity:
+            continue
+        if text and text not in SEARCH_KEY[code]:
+            continue
+        out.append(code)
+    return out
+
+
+# =========================================================
+# STAT VECTORS
+# =========================================================
+
+def req_vector(req: Dict[str, int]) -> StatVec:
+    vec = [0] * len(AXES)
+    for k, v in req.items():
+        if k not in AXIS_INDEX:
+            raise RuntimeError(f"Unbekannte Achse in Anforderung: {k}")
+        vec[AXIS_INDEX[k]] = int(v)
+    return tuple(vec)
+
+
+def sum_vectors(codes: Iterable[str]) -> StatVec:
+    totals = [0] * len(AXES)
+    for code in codes:
+        for i, v in enumerate(CATALOG[code].vec):
+            totals[i] += v
+    return tuple(totals)
+
+
+def meets(req_vec: StatVec, totals: StatVec) -> bool:
+    return all(t >= r for t, r in zip(totals, req_vec))
+
+
+# =========================================================
+# STARTER DECKS (40 Karten)
+# =========================================================
+
+# totals must be 40; checked once at import below
+STARTER_DECKS: Dict[str, Dict[str, int]] = {
+    "Brandbekämpfung": {
+        "V100": 16,  # LHF
+        "V101": 8,   # TLF
+        "V102": 8,   # DLK
+        "V103": 8,   # SW
+    },
+    "Notfallrettung": {
+        "V108": 18,  # RTW
+        "V109": 12,  # NEF
+        "V110": 6,   # ITW
+        "V111": 4,   # RTH
+    },
+    "Technische Hilfe": {
+        "V104": 6,   # Kran
+        "V105": 14,  # ELW1
+        "V103": 10,  # SW (Logistik)
+        "V100": 10,  # LHF (unterstützend)
+    },
+}
+
+
+def starter_decks() -> Dict[str, Dict[str, int]]:
+    # fresh copies, callers may edit them
+    return {name: dict(deck) for name, deck in STARTER_DECKS.items()}
+
+
+def validate_deck_40(deck: Dict[str, int]) -> None:
+    total = sum(int(v) for v in deck.values())
+    if total != 40:
+        raise RuntimeError(f"Deck ist nicht 40 Karten (ist {total}).")
+    for code in deck.keys():
+        if code not in CATALOG:
+            raise RuntimeError(f"Deck enthält unbekannte Karte: {code}")
+
+
+def deck_to_list(deck: Dict[str, int]) -> List[str]:
+    cards: List[str] = []
+    for code, qty in deck.items():
+        cards.extend([code] * int(qty))
+    return cards
+
+
+for _deck in STARTER_DECKS.values():
+    validate_deck_40(_deck)
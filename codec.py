@@ -0,0 +1,217 @@
+import json
+import struct
+import sys
+from array import array
+from dataclasses import asdict
+from typing import Dict, List
+
+import duel
+from cards import AXES, CATALOG, INCIDENTS
+
+# Binary match-state serializer, an alternative to json.dumps at the storage and
+# transport boundary. The rules keep working on the plain dict; this only changes
+# how it is written:
+#   card codes      -> uint16 index into CARD_CODES (hands / piles as array('H'))
+#   incidents       -> uint16 index into INCIDENT_CODES + time_left + req
+#                      (name, ew, tags, art_path come back from the catalog)
+#   slot_totals     -> not written, rebuilt from the assignments
+#   unknown keys    -> JSON tail, so new state fields survive without a format bump
+#
+# Indexes follow catalog order. Only append to vehicle_catalog()/incident_catalog()
+# while encoded states are stored anywhere, or bump FORMAT.
+
+MAGIC = b"BF"
+FORMAT = 1
+
+CARD_CODES: List[str] = list(CATALOG)
+CARD_INDEX: Dict[str, int] = {c: i for i, c in enumerate(CARD_CODES)}
+INCIDENT_CODES: List[str] = [i.code for i in INCIDENTS]
+INCIDENT_INDEX: Dict[str, int] = {c: i for i, c in enumerate(INCIDENT_CODES)}
+INCIDENT_BASE: List[dict] = [asdict(i) for i in INCIDENTS]
+
+PHASES = ["planung", "einsatz", "eskalation"]
+PHASE_INDEX = {p: i for i, p in enumerate(PHASES)}
+
+_KNOWN_KEYS = {
+    "version", "round_no", "phase", "pressure", "pressure_max", "active_player", "players",
+    "open_incidents", "assignments", "assigned_this_turn", "round_ew_snapshot", "log", "slot_totals",
+}
+_PLAYER_KEYS = {"ep", "crew", "ew", "hand", "draw_pile"}
+_INCIDENT_KEYS = set(INCIDENT_BASE[0]) if INCIDENT_BASE else set()
+
+_HEAD = struct.Struct("<2sBHBhhI")     # magic, format, round_no, phase, pressure, pressure_max, active_player
+_PLAYER = struct.Struct("<IhhhBh")     # uid, ep, crew, ew, assigned_this_turn, round_ew_snapshot
+_INCIDENT = struct.Struct("<HhB")      # incident index, time_left, req axis bitmask
+_ASSIGN = struct.Struct("<IH")         # user_id, card index
+_SLOT = struct.Struct("<BB")           # slot, entry count
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+# req values for every possible axis bitmask
+_REQ = [struct.Struct(f"<{bin(mask).count('1')}h") for mask in range(1 << len(AXES))]
+_REQ_AXES = [[a for bit, a in enumerate(AXES) if mask & (1 << bit)] for mask in range(1 << len(AXES))]
+
+
+# =========================================================
+# CARDS
+# =========================================================
+
+def pack_cards(codes: List[str]) -> array:
+    return array("H", [CARD_INDEX[c] for c in codes])
+
+
+def unpack_cards(packed: array) -> List[str]:
+    return [CARD_CODES[i] for i in packed]
+
+
+def _cards_bytes(codes: List[str]) -> bytes:
+    a = pack_cards(codes)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return _U16.pack(len(a)) + a.tobytes()
+
+
+# =========================================================
+# ENCODE
+# =========================================================
+
+def _str_bytes(s: str) -> bytes:
+    b = s.encode("utf-8")
+    return _U16.pack(len(b)) + b
+
+
+def dumps(state: dict) -> bytes:
+    for p in state["players"].values():
+        if set(p) != _PLAYER_KEYS:
+            raise RuntimeError(f"Spielerfelder ohne Binärformat: {sorted(set(p) ^ _PLAYER_KEYS)}")
+    for inc in state["open_incidents"]:
+        if set(inc) != _INCIDENT_KEYS:
+            raise RuntimeError(f"Einsatzfelder ohne Binärformat: {sorted(set(inc) ^ _INCIDENT_KEYS)}")
+
+    out = bytearray(_HEAD.pack(
+        MAGIC, FORMAT, int(state["round_no"]), PHASE_INDEX[state["phase"]],
+        int(state["pressure"]), int(state["pressure_max"]), int(state["active_player"]),
+    ))
+    out += _str_bytes(str(state["version"]))
+
+    players = state["players"]
+    out.append(len(players))
+    for uid, p in players.items():
+        out += _PLAYER.pack(
+            int(uid), int(p["ep"]), int(p["crew"]), int(p["ew"]),
+            1 if state["assigned_this_turn"].get(uid) else 0, int(state["round_ew_snapshot"].get(uid, 0)),
+        )
+        out += _cards_bytes(p["hand"])
+        out += _cards_bytes(p["draw_pile"])
+
+    incidents = state["open_incidents"]
+    out.append(len(incidents))
+    for inc in incidents:
+        mask = 0
+        vals = []
+        for bit, axis in enumerate(AXES):
+            if axis in inc["req"]:
+                mask |= 1 << bit
+                vals.append(int(inc["req"][axis]))
+        out += _INCIDENT.pack(INCIDENT_INDEX[inc["code"]], int(inc["time_left"]), mask)
+        out += _REQ[mask].pack(*vals)
+
+    slots = state["assignments"]
+    out.append(len(slots))
+    for slot, entries in slots.items():
+        out += _SLOT.pack(int(slot), len(entries))
+        for a in entries:
+            out += _ASSIGN.pack(int(a["user_id"]), CARD_INDEX[a["card_code"]])
+
+    log = state["log"]
+    out += _U16.pack(len(log))
+    for line in log:
+        out += _str_bytes(line)
+
+    extras = {k: v for k, v in state.items() if k not in _KNOWN_KEYS}
+    tail = json.dumps(extras, separators=(",", ":")).encode("utf-8") if extras else b""
+    out += _U32.pack(len(tail)) + tail
+    return bytes(out)
+
+
+# =========================================================
+# DECODE
+# =========================================================
+
+class _Reader:
+    def __init__(self, buf: bytes):
+        self.buf = memoryview(buf)
+        self.pos = 0
+
+    def read(self, st: struct.Struct) -> tuple:
+        v = st.unpack_from(self.buf, self.pos)
+        self.pos += st.size
+        return v
+
+    def byte(self) -> int:
+        v = self.buf[self.pos]
+        self.pos += 1
+        return v
+
+    def raw(self, n: int) -> bytes:
+        v = bytes(self.buf[self.pos:self.pos + n])
+        self.pos += n
+        return v
+
+    def string(self) -> str:
+        (n,) = self.read(_U16)
+        return self.raw(n).decode("utf-8")
+
+    def cards(self) -> List[str]:
+        (n,) = self.read(_U16)
+        a = array("H")
+        a.frombytes(self.raw(2 * n))
+        if sys.byteorder != "little":
+            a.byteswap()
+        return unpack_cards(a)
+
+
+def loads(data: bytes) -> dict:
+    r = _Reader(data)
+    magic, fmt, round_no, phase, pressure, pressure_max, active = r.read(_HEAD)
+    if magic != MAGIC or fmt != FORMAT:
+        raise RuntimeError(f"Unbekanntes State-Format: {magic!r} v{fmt}")
+    state = {"version": r.string(), "round_no": round_no, "phase": PHASES[phase],
+             "pressure": pressure, "pressure_max": pressure_max, "active_player": active}
+
+    players, assigned, snapshot = {}, {}, {}
+    for _ in range(r.byte()):
+        uid, ep, crew, ew, did_assign, snap = r.read(_PLAYER)
+        key = str(uid)
+        players[key] = {"ep": ep, "crew": crew, "ew": ew, "hand": r.cards(), "draw_pile": r.cards()}
+        assigned[key] = bool(did_assign)
+        snapshot[key] = snap
+    state["players"] = players
+
+    incidents = []
+    for _ in range(r.byte()):
+        idx, time_left, mask = r.read(_INCIDENT)
+        base = INCIDENT_BASE[idx]
+        req = dict(zip(_REQ_AXES[mask], r.read(_REQ[mask])))
+        incidents.append({**base, "time_left": time_left, "req": req, "tags": list(base["tags"])})
+    state["open_incidents"] = incidents
+
+    slots = {}
+    for _ in range(r.byte()):
+        slot, n = r.read(_SLOT)
+        entries = []
+        for _ in range(n):
+            uid, card = r.read(_ASSIGN)
+            entries.append({"user_id": uid, "card_code": CARD_CODES[card]})
+        slots[str(slot)] = entries
+    state["assignments"] = slots
+    state["assigned_this_turn"] = assigned
+    state["round_ew_snapshot"] = snapshot
+
+    (n_log,) = r.read(_U16)
+    state["log"] = [r.string() for _ in range(n_log)]
+
+    (n_tail,) = r.read(_U32)
+    if n_tail:
+        state.update(json.loads(r.raw(n_tail)))
+    duel.running_slots(state)
+    return state
@@ -0,0 +1,245 @@
+"""Deck optimizer: builds a strong legal 40-card deck from a collection.
+
+    python deckbuilder.py --budget 0.5 --verify 400
+    python deckbuilder.py --owned 2 --axis rettung=2 --target-ep 2.5
+
+Simulated annealing over card counts. The score is analytic so one evaluation is
+a few dozen float operations; --verify plays the result against the starter decks
+with the headless simulator.
+"""
+import argparse
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from math import comb
+from typing import Dict, List, Optional, Tuple
+
+from cards import AXES, CATALOG, INCIDENTS, VehicleCard, filter_codes, req_vector
+from duel import HAND_SIZE
+
+DECK_SIZE = 40
+STRONG_SHARE = 0.75  # a card covering this share of a requirement counts as "strong"
+
+
+@dataclass
+class DeckProfile:
+    """What the optimizer aims for. Defaults: every axis equally important, average EP cost 3."""
+    axis_weight: Dict[str, float] = field(default_factory=dict)  # missing axes weigh 1.0
+    target_avg_ep: float = 3.0
+    ep_penalty: float = 2.0     # per (EP above target)^2
+    strong_credit: float = 0.5  # value of a strong-but-not-sufficient card relative to a sufficient one
+
+
+# =========================================================
+# SCORE
+# =========================================================
+
+def _p_in_hand(k: int) -> float:
+    # probability that an opening hand holds at least one of k copies (hypergeometric)
+    return 1.0 - comb(DECK_SIZE - k, HAND_SIZE) / comb(DECK_SIZE, HAND_SIZE)
+
+
+P_IN_HAND = [_p_in_hand(k) for k in range(DECK_SIZE + 1)]
+
+
+def coverage(card: VehicleCard, req: Tuple[int, ...]) -> float:
+    """Share of an incident requirement a single card covers (1.0 = meets it alone)."""
+    need = sum(req)
+    if need <= 0:
+        return 1.0
+    return sum(min(v, r) for v, r in zip(card.vec, req)) / need
+
+
+class _Model:
+    """Per-card incident coverage for the cards of one collection, precomputed once."""
+
+    def __init__(self, codes: List[str], profile: DeckProfile):
+        self.codes = codes
+        self.profile = profile
+        self.weights: List[float] = []
+        reqs = []
+        for inc in INCIDENTS:
+            req = req_vector(inc.req)
+            axes = [a for a, r in zip(AXES, req) if r > 0]
+            axis_w = sum(profile.axis_weight.get(a, 1.0) for a in axes) / max(1, len(axes))
+            self.weights.append(inc.ew * axis_w)
+            reqs.append(req)
+        self.n_inc = len(reqs)
+        # full[c] / strong[c]: incidents card c meets alone / covers at least STRONG_SHARE of
+        self.full: List[List[int]] = []
+        self.strong: List[List[int]] = []
+        self.cost: List[int] = []
+        for code in codes:
+            card = CATALOG[code]
+            cov = [coverage(card, req) for req in reqs]
+            self.full.append([i for i, c in enumerate(cov) if c >= 1.0])
+            self.strong.append([i for i, c in enumerate(cov) if STRONG_SHARE <= c < 1.0])
+            self.cost.append(int(card.cost_ep))
+
+    def tallies(self, counts: List[int]) -> Tuple[List[int], List[int], int]:
+        k_full = [0] * self.n_inc
+        k_strong = [0] * self.n_inc
+        ep = 0
+        for c, n in enumerate(counts):
+            if n:
+                for i in self.full[c]:
+                    k_full[i] += n
+                for i in self.strong[c]:
+                    k_strong[i] += n
+                ep += n * self.cost[c]
+        return k_full, k_strong, ep
+
+    def score(self, k_full: List[int], k_strong: List[int], ep: int) -> float:
+        p = self.profile
+        s = 0.0
+        for i, w in enumerate(self.weights):
+            pf = P_IN_HAND[k_full[i]]
+            ps = P_IN_HAND[min(DECK_SIZE, k_full[i] + k_strong[i])]
+            s += w * (pf + p.strong_credit * (ps - pf))
+        over = max(0.0, ep / DECK_SIZE - p.target_avg_ep)
+        return s - p.ep_penalty * over * over
+
+
+def score_deck(deck: Dict[str, int], profile: Optional[DeckProfile] = None) -> float:
+    codes = [c for c in deck if int(deck[c]) > 0]
+    model = _Model(codes, profile or DeckProfile())
+    return model.score(*model.tallies([int(deck[c]) for c in codes]))
+
+
+# =========================================================
+# SEARCH
+# =========================================================
+
+def _initial(model: _Model, owned: List[int], start: Optional[Dict[str, int]]) -> List[int]:
+    counts = [0] * len(owned)
+    if start:
+        for c, code in enumerate(model.codes):
+            counts[c] = min(owned[c], max(0, int(start.get(code, 0))))
+        # trim an over-full start from the back of the catalog order
+        for c in reversed(range(len(counts))):
+            excess = sum(counts) - DECK_SIZE
+            if excess <= 0:
+                break
+            counts[c] -= min(counts[c], excess)
+    # top up with the cards that cover the most incidents per EP
+    order = sorted(range(len(owned)),
+                   key=lambda c: -(len(model.full[c]) + 0.5 * len(model.strong[c])) / max(1, model.cost[c]))
+    total = sum(counts)
+    for c in order:
+        if total >= DECK_SIZE:
+            break
+        add = min(owned[c] - counts[c], DECK_SIZE - total)
+        counts[c] += add
+        total += add
+    return counts
+
+
+def build_deck(collection: Dict[str, int], profile: Optional[DeckProfile] = None,
+               time_budget_s: float = 0.3, seed: Optional[int] = None,
+               start: Optional[Dict[str, int]] = None) -> Tuple[Dict[str, int], float]:
+    """Best 40-card deck found within ``time_budget_s``; returns (deck, score).
+
+    Never uses more copies than owned. ``start`` (e.g. the current draft) seeds the search.
+    """
+    profile = profile or DeckProfile()
+    codes = filter_codes(c for c, q in collection.items() if int(q) > 0)
+    owned = [int(collection[c]) for c in codes]
+    if sum(owned) < DECK_SIZE:
+        raise RuntimeError(f"Zu wenige Karten für ein Deck ({sum(owned)} / {DECK_SIZE}).")
+
+    rng = random.Random(seed)
+    model = _Model(codes, profile)
+    counts = _initial(model, owned, start)
+    k_full, k_strong, ep = model.tallies(counts)
+    cur = model.score(k_full, k_strong, ep)
+    best, best_counts = cur, list(counts)
+
+    n = len(codes)
+    t_start = time.perf_counter()
+    deadline = t_start + max(0.0, time_budget_s)
+    t_hot, t_cold = 0.05, 0.0005
+    temp = t_hot
+    it = 0
+    while True:
+        if it % 256 == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            frac = (now - t_start) / max(1e-9, deadline - t_start)
+            temp = t_hot * (t_cold / t_hot) ** frac
+        it += 1
+
+        # move one copy from card a to card b; the deck stays at 40
+        a = rng.randrange(n)
+        b = rng.randrange(n)
+        if a == b or counts[a] == 0 or counts[b] >= owned[b]:
+            continue
+        for i in model.full[a]:
+            k_full[i] -= 1
+        for i in model.strong[a]:
+            k_strong[i] -= 1
+        for i in model.full[b]:
+            k_full[i] += 1
+        for i in model.strong[b]:
+            k_strong[i] += 1
+        ep += model.cost[b] - model.cost[a]
+        new = model.score(k_full, k_strong, ep)
+
+        if new >= cur or rng.random() < math.exp((new - cur) / temp):
+            counts[a] -= 1
+            counts[b] += 1
+            cur = new
+            if cur > best:
+                best, best_counts = cur, list(counts)
+        else:
+            for i in model.full[a]:
+                k_full[i] += 1
+            for i in model.strong[a]:
+                k_strong[i] += 1
+            for i in model.full[b]:
+                k_full[i] -= 1
+            for i in model.strong[b]:
+                k_strong[i] -= 1
+            ep -= model.cost[b] - model.cost[a]
+
+    return {codes[c]: q for c, q in enumerate(best_counts) if q > 0}, best
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main() -> None:
+    from cards import starter_decks
+    from simulate import simulate
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--owned", type=int, default=4, help="copies owned of every catalog card")
+    ap.add_argument("--budget", type=float, default=0.5, help="search time in seconds")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--target-ep", type=float, default=3.0)
+    ap.add_argument("--axis", action="append", default=[], help="axis weight, e.g. rettung=2")
+    ap.add_argument("--verify", type=int, default=0, help="simulated games per starter deck (greedy bots)")
+    args = ap.parse_args()
+
+    profile = DeckProfile(axis_weight={k: float(v) for k, v in (a.split("=", 1) for a in args.axis)},
+                          target_avg_ep=args.target_ep)
+    collection = {code: args.owned for code in CATALOG}
+    t0 = time.perf_counter()
+    deck, score = build_deck(collection, profile, args.budget, args.seed)
+    print(f"Deck (Score {score:.3f}, {time.perf_counter() - t0:.2f}s):")
+    for code in filter_codes(deck):
+        print(f"  {deck[code]:>2}× {CATALOG[code].name} ({code})")
+    avg_ep = sum(CATALOG[c].cost_ep * q for c, q in deck.items()) / DECK_SIZE
+    print(f"  Ø EP {avg_ep:.2f}")
+
+    for name, starter in starter_decks().items():
+        print(f"Score {name}: {score_deck(starter, profile):.3f}")
+        if args.verify:
+            r = simulate(deck, starter, args.verify, workers=1, seed=args.seed, bot_a="greedy", bot_b="greedy")
+            print(f"  vs {name}: Siege {r['win_rate_a']:.1%} / {r['win_rate_b']:.1%}  Remis {r['draw_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from typing import Any, List, Optional, Tuple, Union
+
+import duel
+
+# Compact patches between two JSON-like match states (dicts, lists, scalars).
+#
+#   ["=", path, value]               set a dict key or list item
+#   ["-", path]                      delete a dict key
+#   ["~", path, start, n, items]     list splice: replace n items at start with items
+#
+# path is a list of dict keys / list indexes. Lists are trimmed to their changed
+# middle first, so a card played from the hand, a card drawn from the pile or new
+# log lines become one small splice instead of a copy of the whole list.
+
+Op = List[Any]
+Path = List[Union[str, int]]
+
+
+# =========================================================
+# DIFF
+# =========================================================
+
+def diff(old: Any, new: Any) -> List[Op]:
+    ops: List[Op] = []
+    _diff(old, new, [], ops)
+    return ops
+
+
+def _same(a: Any, b: Any) -> bool:
+    # == alone treats True / 1 / 1.0 as equal, which would drop a type change from the patch;
+    # scalars (card codes, log lines) are settled inline, containers are walked once
+    return a == b and type(a) is type(b) and (type(a) not in (dict, list) or _same_types(a, b))
+
+
+def _same_types(old: Any, new: Any) -> bool:
+    """Types match all the way down; only called once old == new holds."""
+    t = type(old)
+    if t is not type(new):
+        return False
+    if t is dict:
+        for k, v in old.items():
+            w = new[k]
+            tv = type(v)
+            if tv is not type(w) or ((tv is dict or tv is list) and not _same_types(v, w)):
+                return False
+    elif t is list:
+        for v, w in zip(old, new):
+            tv = type(v)
+            if tv is not type(w) or ((tv is dict or tv is list) and not _same_types(v, w)):
+                return False
+    return True
+
+
+def _diff(old: Any, new: Any, path: Path, ops: List[Op]) -> None:
+    if _same(old, new):
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for k, v in new.items():
+            if k not in old:
+                ops.append(["=", path + [k], v])
+            else:
+                _diff(old[k], v, path + [k], ops)
+        for k in old:
+            if k not in new:
+                ops.append(["-", path + [k]])
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, ops)
+    else:
+        ops.append(["=", path, new])
+
+
+def _diff_list(old: list, new: list, path: Path, ops: List[Op]) -> None:
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and _same(old[start], new[start]):
+        start += 1
+    end_old, end_new = len(old), len(new)
+    while end_old > start and end_new > start and _same(old[end_old - 1], new[end_new - 1]):
+        end_old -= 1
+        end_new -= 1
+
+    mid_old, mid_new = old[start:end_old], new[start:end_new]
+    if len(mid_old) == len(mid_new) and all(isinstance(x, (dict, list)) for x in mid_old + mid_new):
+        # same shape, nested containers changed in place (incidents, slot lists)
+        for i, (a, b) in enumerate(zip(mid_old, mid_new)):
+            _diff(a, b, path + [start + i], ops)
+    else:
+        ops.append(["~", path, start, len(mid_old), mid_new])
+
+
+# =========================================================
+# APPLY
+# =========================================================
+
+def apply(state: Any, ops: List[Op]) -> Any:
+    """Apply a patch in place and return the result (a root "=" replaces the state)."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if kind == "~":
+            target = state
+            for key in path:
+                target = target[key]
+            target[op[2]:op[2] + op[3]] = op[4]
+            continue
+        if not path:
+            if kind != "=":
+                raise RuntimeError(f"Ungültige Patch-Operation am Wurzelknoten: {kind}")
+            state = op[2]
+            continue
+        parent = state
+        for key in path[:-1]:
+            parent = parent[key]
+        if kind == "=":
+            parent[path[-1]] = op[2]
+        elif kind == "-":
+            del parent[path[-1]]
+        else:
+            raise RuntimeError(f"Unbekannte Patch-Operation: {kind}")
+    return state
+
+
+# =========================================================
+# ACTIONS
+# =========================================================
+
+def action_patch(state: Optional[dict], kind: str, payload: dict) -> Tuple[dict, List[Op]]:
+    """Apply a match event to a copy of ``state``; return the new state and the patch to it."""
+    new = duel.apply_event(duel.clone_state(state) if state is not None else None, kind, payload)
+    return new, diff(state, new)
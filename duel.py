@@ -0,0 +1,455 @@
+import random
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from cards import AXES, CATALOG, INCIDENT_BY_CODE, INCIDENTS, VehicleCard, deck_to_list, meets, req_vector, sum_vectors
+
+# Pure duel rules: no DB, no UI. A match is a plain dict (JSON-serializable),
+# every persisted action is an event that can be re-applied with apply_event().
+
+ROUND_WIN_COINS = 5
+LOG_CAP = 60  # state["log"] is a ring buffer; the full log is persisted out of band
+HAND_SIZE = 10  # opening hand
+START_EP = 6    # EP at the first turn
+MAX_EP = 10     # EP cap, see apply_resources
+EP_PER_TURN = 2
+
+IncidentDraw = Callable[[], dict]
+
+
+# =========================================================
+# INCIDENT DRAWS
+# =========================================================
+
+def random_incident() -> dict:
+    return asdict(random.choice(INCIDENTS))
+
+
+def rng_draw(rng: random.Random) -> IncidentDraw:
+    def draw() -> dict:
+        return asdict(rng.choice(INCIDENTS))
+    return draw
+
+
+def recording_draw(codes: List[str]) -> IncidentDraw:
+    # draws randomly and remembers the codes so the event can be replayed
+    def draw() -> dict:
+        inc = random.choice(INCIDENTS)
+        codes.append(inc.code)
+        return asdict(inc)
+    return draw
+
+
+def replay_draw(codes: Iterable[str]) -> IncidentDraw:
+    it = iter(codes)
+
+    def draw() -> dict:
+        return asdict(INCIDENT_BY_CODE[next(it)])
+    return draw
+
+
+# =========================================================
+# SEEDED MATCHES
+# =========================================================
+# A live match draws from its own seed, kept in state["rng"]:
+#   {"seed": int, "incidents": incidents drawn so far, "decks": {uid: {code: qty}}}
+# The draw pile of a player is their sorted deck shuffled with the seed; cards are
+# dealt from its end, so a pile is fully described by its length. Incident k is
+# chosen by a generator seeded with (seed, k). Every draw is a pure function of the
+# seed and a counter: any process rebuilds the same piles and incidents, events
+# need not record what was drawn, and stored states can drop the piles
+# (compact_state). String seeds go through SHA-512, so PYTHONHASHSEED is irrelevant.
+
+def new_seed() -> int:
+    return random.SystemRandom().getrandbits(52)  # stays exact as a JSON / JS number
+
+
+@lru_cache(maxsize=1024)
+def _shuffled(seed: int, user_id: str, deck: Tuple[Tuple[str, int], ...]) -> Tuple[str, ...]:
+    cards = sorted(deck_to_list(dict(deck)))
+    random.Random(f"{seed}/deck/{user_id}").shuffle(cards)
+    return tuple(cards)
+
+
+def shuffled_deck(deck: Dict[str, int], seed: int, user_id) -> List[str]:
+    """The full draw pile of ``user_id`` before the opening hand is dealt."""
+    return list(_shuffled(int(seed), str(user_id), tuple(sorted((c, int(q)) for c, q in deck.items()))))
+
+
+def seeded_draw(state: dict) -> IncidentDraw:
+    rng_state = state.get("rng")
+    if not rng_state:
+        raise RuntimeError("Match ohne Seed: Einsätze müssen im Event stehen.")
+
+    def draw() -> dict:
+        # the counter is advanced by _next_incident, whatever the draw source
+        k = int(rng_state["incidents"])
+        return asdict(random.Random(f"{rng_state['seed']}/incident/{k}").choice(INCIDENTS))
+    return draw
+
+
+def _next_incident(state: dict, draw_incident: IncidentDraw) -> dict:
+    inc = draw_incident()
+    if "rng" in state:
+        state["rng"]["incidents"] = int(state["rng"]["incidents"]) + 1
+    return inc
+
+
+def compact_state(state: dict) -> dict:
+    """Copy for storage: derived fields are dropped, draw piles that follow from the
+    seed are replaced by their length."""
+    c = {k: v for k, v in state.items() if k != "slot_totals"}
+    rng_state = state.get("rng")
+    if not rng_state:
+        return c
+    c["players"] = dict(state["players"])
+    for uid, p in state["players"].items():
+        deck = rng_state["decks"].get(uid)
+        pile = p["draw_pile"]
+        if deck is not None and shuffled_deck(deck, rng_state["seed"], uid)[:len(pile)] == pile:
+            q = {k: v for k, v in p.items() if k != "draw_pile"}
+            q["draw_pile_left"] = len(pile)
+            c["players"][uid] = q
+    return c
+
+
+def expand_state(state: dict) -> dict:
+    """Inverse of compact_state, in place. Also upgrades states stored before slot totals."""
+    running_slots(state)
+    rng_state = state.get("rng")
+    if not rng_state:
+        return state
+    for uid, p in state["players"].items():
+        if "draw_pile_left" in p:
+            pile = shuffled_deck(rng_state["decks"][uid], rng_state["seed"], uid)
+            p["draw_pile"] = pile[:int(p.pop("draw_pile_left"))]
+    return state
+
+
+# =========================================================
+# SLOT TOTALS
+# =========================================================
+# state["slot_totals"][slot] = {"totals": [per AXES], "contrib": {uid: power}} is
+# updated by assign_card, so resolve_phase and the UI compare against the
+# requirement without summing the assigned cards again. It is derived from
+# "assignments" and not stored (compact_state / expand_state).
+
+def _sum_slot(entries: List[dict]) -> dict:
+    contrib: Dict[str, int] = {}
+    for a in entries:
+        uid = str(a["user_id"])
+        contrib[uid] = contrib.get(uid, 0) + CATALOG[a["card_code"]].power
+    return {"totals": list(sum_vectors(a["card_code"] for a in entries)), "contrib": contrib}
+
+
+def running_slots(state: dict) -> Dict[str, dict]:
+    """state["slot_totals"], rebuilt from the assignments if the state comes without it."""
+    if "slot_totals" not in state:
+        state["slot_totals"] = {k: _sum_slot(v) for k, v in state["assignments"].items()}
+    return state["slot_totals"]
+
+
+def slot_state(state: dict, slot: int) -> dict:
+    """Running totals of one slot (read only)."""
+    slots = state.get("slot_totals")
+    return slots[str(slot)] if slots is not None else _sum_slot(state["assignments"][str(slot)])
+
+
+def slot_progress(state: dict, slot: int) -> List[Tuple[str, int, int]]:
+    """(axis, required, assigned) for every axis the slot's incident requires."""
+    totals = slot_state(state, slot)["totals"]
+    req = state["open_incidents"][int(slot)]["req"]
+    return [(a, int(req[a]), t) for a, t in zip(AXES, totals) if int(req.get(a, 0)) > 0]
+
+
+# =========================================================
+# RULES
+# =========================================================
+
+def log(state: dict, line: str) -> None:
+    buf = state["log"]
+    buf.append(line)
+    if len(buf) > LOG_CAP:
+        del buf[:-LOG_CAP]
+
+
+def drain_log(state: dict) -> List[str]:
+    lines = state["log"]
+    state["log"] = []
+    return lines
+
+
+def apply_resources(state: dict, user_id: int) -> None:
+    p = state["players"][str(user_id)]
+    pressure = int(state["pressure"])
+    p["ep"] = min(MAX_EP, int(p["ep"]) + EP_PER_TURN)
+    regen = 1
+    if pressure >= 8:
+        regen = max(0, regen - 1)
+    p["crew"] = min(7, int(p["crew"]) + regen)
+
+
+def draw_from_pile(state: dict, user_id: int, n: int) -> List[str]:
+    uid = str(user_id)
+    pile = state["players"][uid]["draw_pile"]
+    hand = state["players"][uid]["hand"]
+    drawn = []
+    for _ in range(n):
+        if not pile:
+            break
+        drawn.append(pile.pop())
+    hand.extend(drawn)
+    return drawn
+
+
+def end_of_full_round_winner(state: dict) -> Optional[int]:
+    gains = {}
+    for uid_str, pdata in state["players"].items():
+        prev = int(state["round_ew_snapshot"].get(uid_str, 0))
+        gains[uid_str] = int(pdata["ew"]) - prev
+    max_gain = max(gains.values()) if gains else 0
+    winners = [uid for uid, g in gains.items() if g == max_gain and g > 0]
+    if len(winners) == 1:
+        return int(winners[0])
+    return None
+
+
+def new_match_state(p1_id: int, p2_id: int, deck1: List[str], deck2: List[str],
+                    draw_incident: Optional[IncidentDraw] = None, seed: Optional[int] = None) -> dict:
+    """Opening state. With ``seed`` the decks are shuffled and incidents drawn from it
+    (see SEEDED MATCHES); without, the decks are used in the given order."""
+    rng_state = None
+    if seed is not None:
+        decks = {}
+        for uid, deck in ((p1_id, deck1), (p2_id, deck2)):
+            counts: Dict[str, int] = {}
+            for code in deck:
+                counts[code] = counts.get(code, 0) + 1
+            decks[str(uid)] = counts
+        rng_state = {"seed": int(seed), "incidents": 0, "decks": decks}
+        deck1 = shuffled_deck(decks[str(p1_id)], seed, p1_id)
+        deck2 = shuffled_deck(decks[str(p2_id)], seed, p2_id)
+
+    draw1 = deck1[:]
+    draw2 = deck2[:]
+    hand1 = []
+    hand2 = []
+    for _ in range(HAND_SIZE):
+        hand1.append(draw1.pop())
+        hand2.append(draw2.pop())
+
+    state = {
+        "version": "duel_mvp0.1",
+        "round_no": 1,
+        "phase": "planung",
+        "pressure": 0,
+        "pressure_max": 12,
+        "active_player": p1_id,
+        "players": {
+            str(p1_id): {"ep": START_EP, "crew": 5, "ew": 0, "hand": hand1, "draw_pile": draw1},
+            str(p2_id): {"ep": START_EP, "crew": 5, "ew": 0, "hand": hand2, "draw_pile": draw2},
+        },
+        "open_incidents": [],
+        "assignments": {"0": [], "1": []},  # list of {"user_id":..., "card_code":...}
+        "slot_totals": {"0": _sum_slot([]), "1": _sum_slot([])},
+        "assigned_this_turn": {str(p1_id): False, str(p2_id): False},
+        "round_ew_snapshot": {str(p1_id): 0, str(p2_id): 0},
+        "log": [],
+    }
+    if rng_state is not None:
+        state["rng"] = rng_state
+    if draw_incident is None:
+        draw_incident = seeded_draw(state) if rng_state is not None else random_incident
+    state["open_incidents"] = [_next_incident(state, draw_incident), _next_incident(state, draw_incident)]
+    return state
+
+
+def assign_cost(state: dict, card: VehicleCard) -> int:
+    # EP surcharge once pressure reaches 5
+    return int(card.cost_ep) + (1 if int(state["pressure"]) >= 5 else 0)
+
+
+def clone_state(state: dict) -> dict:
+    """Copy of everything the rules mutate; much cheaper than copy.deepcopy for rollouts.
+
+    Incident ``tags`` and assignment entries are never mutated in place and stay shared.
+    """
+    c = dict(state)
+    c["players"] = {
+        uid: {**p, "hand": list(p["hand"]), "draw_pile": list(p["draw_pile"])}
+        for uid, p in state["players"].items()
+    }
+    c["open_incidents"] = [{**inc, "req": dict(inc["req"])} for inc in state["open_incidents"]]
+    c["assignments"] = {k: list(v) for k, v in state["assignments"].items()}
+    if "slot_totals" in state:
+        c["slot_totals"] = {k: {"totals": list(v["totals"]), "contrib": dict(v["contrib"])}
+                            for k, v in state["slot_totals"].items()}
+    c["assigned_this_turn"] = dict(state["assigned_this_turn"])
+    c["round_ew_snapshot"] = dict(state["round_ew_snapshot"])
+    if "rng" in state:
+        c["rng"] = dict(state["rng"])  # decks are never mutated and stay shared
+    c["log"] = []
+    return c
+
+
+def assign_card(state: dict, user_id: int, slot: int, card_code: str) -> Tuple[bool, str]:
+    if state["phase"] != "planung":
+        return False, "Zuweisen nur in Planungsphase."
+    if int(state["active_player"]) != int(user_id):
+        return False, "Nicht dein Zug."
+
+    slot = int(slot)
+    if slot not in [0, 1]:
+        return False, "Ungültiger Slot."
+
+    uid_str = str(user_id)
+    if state["assigned_this_turn"].get(uid_str, False):
+        return False, "Bereits diese Runde zugewiesen (MVP-Regel)."
+
+    hand = state["players"][uid_str]["hand"]
+    if card_code not in hand:
+        return False, "Karte nicht auf der Hand."
+
+    card = CATALOG.get(card_code)
+    if not card:
+        return False, "Unbekannte Karte."
+
+    cost = assign_cost(state, card)
+
+    if int(state["players"][uid_str]["ep"]) < cost:
+        return False, f"Nicht genug EP (benötigt {cost})."
+    if int(state["players"][uid_str]["crew"]) < int(card.crew):
+        return False, "Nicht genug Personal."
+
+    state["players"][uid_str]["ep"] -= cost
+    state["players"][uid_str]["crew"] -= int(card.crew)
+    hand.remove(card_code)
+
+    state["assignments"][str(slot)].append({"user_id": user_id, "card_code": card_code})
+    running = running_slots(state)[str(slot)]
+    running["totals"] = [t + v for t, v in zip(running["totals"], card.vec)]
+    running["contrib"][uid_str] = running["contrib"].get(uid_str, 0) + card.power
+    state["assigned_this_turn"][uid_str] = True
+    log(state, f"{user_id} weist {card.name} Slot {slot+1} zu (Kosten {cost} EP).")
+    return True, "Zugewiesen."
+
+
+def resolve_phase(state: dict, draw_incident: IncidentDraw = random_incident) -> None:
+    slots = running_slots(state)
+    for slot_idx in [0, 1]:
+        inc = state["open_incidents"][slot_idx]
+        req = inc["req"]
+        totals = slots[str(slot_idx)]["totals"]
+        contrib = slots[str(slot_idx)]["contrib"]  # uid -> power
+
+        ok = meets(req_vector(req), totals)
+        log(state, f"Resolve Slot {slot_idx+1} '{inc['name']}': req={req} totals={dict(zip(AXES, totals))}")
+
+        if ok:
+            if contrib:
+                winner_uid = max(contrib.items(), key=lambda x: x[1])[0]
+                state["players"][winner_uid]["ew"] += int(inc["ew"])
+                log(state, f"Erfüllt. Sieger {winner_uid} erhält {inc['ew']} EW.")
+            # replace incident
+            state["open_incidents"][slot_idx] = _next_incident(state, draw_incident)
+        else:
+            log(state, "Nicht erfüllt. Eskalation folgt.")
+
+        state["assignments"][str(slot_idx)] = []
+        slots[str(slot_idx)] = _sum_slot([])
+
+
+def escalate_phase(state: dict) -> None:
+    for slot_idx in [0, 1]:
+        inc = state["open_incidents"][slot_idx]
+        inc["time_left"] = int(inc["time_left"]) - 1
+        state["pressure"] = int(state["pressure"]) + 1
+
+        if int(inc["time_left"]) <= 0:
+            # increase requirements
+            for k, v in list(inc["req"].items()):
+                if int(v) > 0:
+                    inc["req"][k] = int(v) + 1
+            extra = 2 if any(t in inc.get("tags", []) for t in ["gross", "vu", "gefahrgut", "hoehe"]) else 1
+            state["pressure"] = int(state["pressure"]) + extra
+            inc["time_left"] = 2
+            log(state, f"Eskalation Slot {slot_idx+1}: req+1, Druck +{extra}, time reset=2.")
+
+
+def advance_phase(state: dict, user_id: int,
+                  draw_incident: IncidentDraw = random_incident) -> Tuple[bool, str, Optional[int]]:
+    """Advance one phase. Returns (ok, msg, round_winner); the caller credits the coins."""
+    if int(state["active_player"]) != int(user_id):
+        return False, "Nicht dein Zug.", None
+
+    phase = state["phase"]
+    winner = None
+
+    if phase == "planung":
+        state["phase"] = "einsatz"
+        log(state, "Phase -> Einsatz.")
+    elif phase == "einsatz":
+        resolve_phase(state, draw_incident)
+        state["phase"] = "eskalation"
+        log(state, "Phase -> Eskalation.")
+    elif phase == "eskalation":
+        escalate_phase(state)
+
+        pids = list(map(int, state["players"].keys()))
+        pids.sort()
+        other = pids[0] if int(user_id) == pids[1] else pids[1]
+        state["active_player"] = other
+
+        # reset per-turn
+        for k in list(state["assigned_this_turn"].keys()):
+            state["assigned_this_turn"][k] = False
+
+        apply_resources(state, other)
+
+        # full round check when lower id becomes active again
+        if other == pids[0]:
+            winner = end_of_full_round_winner(state)
+            if winner is not None:
+                log(state, f"Runden-Sieger {winner} erhält +{ROUND_WIN_COINS} Coins.")
+                drawn = draw_from_pile(state, winner, 5)
+                log(state, f"Runden-Sieger {winner} zieht 5 Karten: {drawn}")
+
+            for uid_str in list(state["players"].keys()):
+                state["round_ew_snapshot"][uid_str] = int(state["players"][uid_str]["ew"])
+            state["round_no"] = int(state["round_no"]) + 1
+
+        state["phase"] = "planung"
+        log(state, "Zugwechsel. Phase -> Planung.")
+    else:
+        return False, "Ungültige Phase.", None
+
+    return True, "Phase weiter.", winner
+
+
+# =========================================================
+# EVENTS
+# =========================================================
+
+def apply_event(state: dict, kind: str, payload: dict) -> dict:
+    if kind == "start":
+        return expand_state(payload)
+    if kind == "assign":
+        ok, msg = assign_card(state, int(payload["user_id"]), int(payload["slot"]), payload["card_code"])
+    elif kind == "advance":
+        # seeded matches don't record their incidents; the seed reproduces them
+        draw = replay_draw(payload["incidents"]) if "incidents" in payload else seeded_draw(state)
+        ok, msg, _ = advance_phase(state, int(payload["user_id"]), draw)
+    else:
+        raise RuntimeError(f"Unbekanntes Match-Event: {kind}")
+    if not ok:
+        raise RuntimeError(f"Match-Event '{kind}' nicht anwendbar: {msg}")
+    return state
+
+
+def fold(state: Optional[dict], events: Iterable[Tuple[str, dict]]) -> dict:
+    for kind, payload in events:
+        state = apply_event(state, kind, payload)
+    if state is None:
+        raise RuntimeError("Match not found")
+    return state
@@ -0,0 +1,520 @@
+import json
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import duel
+from broker import get_broker
+from storage import db, get_pool, match_db, match_db_path, match_db_paths
+
+# Match persistence as an append-only event log:
+#   match_events  one small row per action (seq 0 = "start" with the initial state)
+#   matches       latest snapshot (state_json @ snapshot_seq) + version (= newest seq)
+#   match_log     human-readable log lines, kept out of the state
+# match_load() = fold(snapshot, events after snapshot_seq).
+# Seeded matches (duel.new_match_state(seed=...)) store their states compacted:
+# draw piles are rebuilt from the seed, and advance events carry no incidents.
+# All of it lives in the room's match DB (storage.match_db), which may be a
+# separate file or shard from the account data.
+#
+# Writes are optimistic: the state is loaded without a lock, mutated in Python and
+# appended only if matches.version is still the loaded one; otherwise MatchConflict.
+# After each commit the new state is published on the room's broker channel.
+#
+# Active matches are also kept folded in memory (ActiveMatches, see below):
+#   reads and writes start with one version probe (PK lookup) instead of snapshot
+#   + json.loads + fold; a mismatch (another process wrote) drops the entry and
+#   reloads. The optimistic UPDATE ... WHERE version=? still catches writes that
+#   land between the probe and the commit.
+# Durability is unchanged for actions: every action commits its event row before
+# it is acknowledged. Only the snapshot is write-behind: it is written at phase
+# boundaries (advance) once SNAPSHOT_EVERY events are pending, and when an entry
+# is evicted (LRU / idle) or flushed. A crash loses at most that snapshot, and
+# _load rebuilds the same state by folding the events after the last one.
+
+SNAPSHOT_EVERY = 20
+CONFLICT_RETRIES = 8
+CONFLICT_BACKOFF_S = 0.005
+ACTIVE_MATCHES_SIZE = 256
+ACTIVE_MATCH_IDLE_S = 300
+
+
+class MatchConflict(RuntimeError):
+    pass
+
+
+class MatchNotFound(RuntimeError):
+    pass
+
+
+# =========================================================
+# ACTIVE MATCH CACHE
+# =========================================================
+
+class _Entry:
+    __slots__ = ("state", "version", "snap", "used")
+
+    def __init__(self, state: dict, version: int, snap: int):
+        self.state = state  # never mutated once stored; callers get duel.clone_state copies
+        self.version = version
+        self.snap = snap
+        self.used = time.monotonic()
+
+
+class ActiveMatches:
+    """Folded states of recently used matches (LRU + idle eviction, snapshot write-behind)."""
+
+    def __init__(self, maxsize: int = ACTIVE_MATCHES_SIZE, idle_s: float = ACTIVE_MATCH_IDLE_S):
+        self.maxsize = int(maxsize)
+        self.idle_s = float(idle_s)
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.flushes = 0
+
+    def get(self, room_code: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._data.get(room_code)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry.used = time.monotonic()
+            self._data.move_to_end(room_code)
+            self.hits += 1
+            return entry
+
+    def put(self, room_code: str, state: dict, version: int, snap: int) -> None:
+        with self._lock:
+            old = self._data.get(room_code)
+            if old is not None and old.version > version:
+                return  # a newer version is already cached (concurrent writer in this process)
+            self._data[room_code] = _Entry(state, version, snap)
+            self._data.move_to_end(room_code)
+            evicted = self._evict_locked(time.monotonic())
+        self._flush(evicted)
+
+    def drop(self, room_code: str) -> None:
+        with self._lock:
+            if self._data.pop(room_code, None) is not None:
+                self.stale += 1
+
+    def flush(self, evict_idle: bool = True) -> int:
+        """Evict idle entries and write pending snapshots of the rest; returns snapshots written."""
+        with self._lock:
+            evicted = self._evict_locked(time.monotonic()) if evict_idle else []
+            pending = [(code, e) for code, e in self._data.items() if e.version > e.snap]
+        n = self._flush(evicted + pending)
+        with self._lock:
+            for code, e in pending:
+                if self._data.get(code) is e:
+                    e.snap = e.version
+        return n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def _evict_locked(self, now: float) -> List[Tuple[str, _Entry]]:
+        evicted = []
+        while self._data:
+            code, oldest = next(iter(self._data.items()))
+            if len(self._data) <= self.maxsize and now - oldest.used < self.idle_s:
+                break
+            del self._data[code]
+            evicted.append((code, oldest))
+        self.evictions += len(evicted)
+        return evicted
+
+    def _flush(self, entries: List[Tuple[str, _Entry]]) -> int:
+        todo = [(code, e) for code, e in entries if e.version > e.snap]
+        if not todo:
+            return 0
+        by_path: Dict[str, List[Tuple[str, _Entry]]] = {}
+        for code, e in todo:
+            by_path.setdefault(match_db_path(code), []).append((code, e))
+        for path, items in by_path.items():
+            with get_pool(path).connection(immediate=True) as con:
+                for code, e in items:
+                    # any process may write it: the state at a seq is the same everywhere.
+                    # Versions keep growing across match_create and archival, so a newer
+                    # match of the same room has a higher snapshot_seq and is skipped.
+                    con.execute(
+                        "UPDATE matches SET state_json=?, snapshot_seq=? WHERE room_code=? AND snapshot_seq<?",
+                        (json.dumps(duel.compact_state(duel.clone_state(e.state))), e.version, code, e.version),
+                    )
+        with self._lock:
+            self.flushes += len(todo)
+        return len(todo)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": "active_matches",
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "idle_s": self.idle_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "snapshot_flushes": self.flushes,
+            }
+
+
+_ACTIVE: Optional[ActiveMatches] = ActiveMatches()
+
+
+def get_active_matches() -> Optional[ActiveMatches]:
+    return _ACTIVE
+
+
+def set_active_matches(active: Optional[ActiveMatches]) -> None:
+    """Swap the cache (None disables it). Pending snapshots of the old one are written first."""
+    global _ACTIVE
+    old, _ACTIVE = _ACTIVE, active
+    if old is not None:
+        old.flush(evict_idle=False)
+        old.clear()
+
+
+def flush_active_matches() -> int:
+    return _ACTIVE.flush() if _ACTIVE is not None else 0
+
+
+# =========================================================
+# READ
+# =========================================================
+
+def _load(con: sqlite3.Connection, room_code: str) -> Tuple[dict, int, int]:
+    row = con.execute(
+        "SELECT state_json, snapshot_seq, version FROM matches WHERE room_code=?",
+        (room_code,),
+    ).fetchone()
+    if not row:
+        raise MatchNotFound("Match not found")
+
+    events = con.execute(
+        "SELECT kind, payload FROM match_events WHERE room_code=? AND seq>? ORDER BY seq",
+        (room_code, int(row["snapshot_seq"])),
+    ).fetchall()
+    state = duel.fold(duel.expand_state(json.loads(row["state_json"])), ((e["kind"], json.loads(e["payload"])) for e in events))
+    # replayed log lines are already in match_log
+    state["log"] = []
+    return state, int(row["version"]), int(row["snapshot_seq"])
+
+
+def _load_current(room_code: str) -> Tuple[dict, int, int]:
+    # a cached entry is used only after a version probe: another worker may have moved on
+    active = _ACTIVE
+    entry = active.get(room_code) if active is not None else None
+    with match_db(room_code) as con:
+        if entry is not None:
+            row = con.execute("SELECT version FROM matches WHERE room_code=?", (room_code,)).fetchone()
+            if row and int(row["version"]) == entry.version:
+                return duel.clone_state(entry.state), entry.version, entry.snap
+            active.drop(room_code)
+        state, version, snap = _load(con, room_code)
+    if active is not None:
+        active.put(room_code, duel.clone_state(state), version, snap)
+    return state, version, snap
+
+
+def match_load(room_code: str) -> dict:
+    return _load_current(room_code)[0]
+
+
+def _load_for_write(room_code: str) -> Tuple[dict, int, int]:
+    # the probe keeps rule checks (turn, phase) off a stale copy; the conditional
+    # UPDATE in _append still catches a write that lands after it
+    return _load_current(room_code)
+
+
+def _remember(room_code: str, state: dict, version: int, snap: int) -> None:
+    if _ACTIVE is not None:
+        _ACTIVE.put(room_code, duel.clone_state(state), version, snap)
+
+
+def match_replay(room_code: str) -> Iterator[dict]:
+    """Yield the state after every event of the current match, starting with the initial state."""
+    with match_db(room_code) as con:
+        rows = con.execute(
+            "SELECT kind, payload FROM match_events WHERE room_code=? ORDER BY seq",
+            (room_code,),
+        ).fetchall()
+    state = None
+    for r in rows:
+        if state is not None:
+            state["log"] = []  # each yielded state carries only the lines of its own event
+        state = duel.apply_event(state, r["kind"], json.loads(r["payload"]))
+        yield json.loads(json.dumps(state))
+
+
+def match_log_count(room_code: str) -> int:
+    with match_db(room_code) as con:
+        row = con.execute("SELECT COUNT(*) AS n FROM match_log WHERE room_code=?", (room_code,)).fetchone()
+    return int(row["n"])
+
+
+def match_log_page(room_code: str, page: int = 0, page_size: int = duel.LOG_CAP) -> List[str]:
+    """Log lines in chronological order; page 0 is the newest page."""
+    with match_db(room_code) as con:
+        rows = con.execute(
+            "SELECT line FROM match_log WHERE room_code=? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (room_code, int(page_size), int(page) * int(page_size)),
+        ).fetchall()
+    return [r["line"] for r in reversed(rows)]
+
+
+# =========================================================
+# WRITE
+# =========================================================
+
+def _write_log(con: sqlite3.Connection, room_code: str, lines: List[str], now: int) -> None:
+    if lines:
+        con.executemany(
+            "INSERT INTO match_log(room_code, line, created_at) VALUES (?, ?, ?)",
+            [(room_code, line, now) for line in lines],
+        )
+
+
+def _append(con: sqlite3.Connection, room_code: str, version: int, snap: int,
+            kind: str, payload: dict, state: dict) -> Tuple[int, int]:
+    """Append one event; returns (new version, snapshot seq)."""
+    seq = version + 1
+    now = int(time.time())
+    lines = duel.drain_log(state)
+    # with the active-match cache the snapshot waits for a phase boundary
+    snapshot = seq - snap >= SNAPSHOT_EVERY and (_ACTIVE is None or kind == "advance")
+    if snapshot:
+        cur = con.execute(
+            "UPDATE matches SET state_json=?, snapshot_seq=?, version=?, updated_at=? "
+            "WHERE room_code=? AND version=?",
+            (json.dumps(duel.compact_state(state)), seq, seq, now, room_code, version),
+        )
+    else:
+        cur = con.execute(
+            "UPDATE matches SET version=?, updated_at=? WHERE room_code=? AND version=?",
+            (seq, now, room_code, version),
+        )
+    if cur.rowcount != 1:
+        if _ACTIVE is not None:
+            _ACTIVE.drop(room_code)
+        raise MatchConflict(f"Match {room_code} wurde parallel geändert (Version {version}).")
+
+    _write_log(con, room_code, lines, now)
+    con.execute(
+        "INSERT INTO match_events(room_code, seq, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+        (room_code, seq, kind, json.dumps(payload), now),
+    )
+    return seq, seq if snapshot else snap
+
+
+def _room_closed(con: sqlite3.Connection, room_code: str) -> bool:
+    # read inside the action's write transaction, so no action commits after room_finish / expiry
+    from rooms import ROOM_CLOSED  # rooms imports this module
+    row = con.execute("SELECT state FROM rooms WHERE room_code=?", (room_code,)).fetchone()
+    return row is not None and row["state"] in ROOM_CLOSED
+
+
+def _publish(room_code: str, version: int, kind: str, state: dict, lines: List[str]) -> None:
+    # the published state carries the log lines of this one action
+    state["log"] = lines
+    get_broker().publish(room_code, {"room_code": room_code, "version": version, "kind": kind, "state": state})
+
+
+def with_conflict_retry(fn: Callable[..., Tuple[bool, str]], *args) -> Tuple[bool, str]:
+    """Run a load -> mutate -> append action, reloading and retrying on MatchConflict.
+
+    A match archived or deleted by another worker in between (e.g. rooms.sweep) is a normal result.
+    """
+    for attempt in range(CONFLICT_RETRIES):
+        try:
+            return fn(*args)
+        except MatchNotFound:
+            return False, "Match nicht gefunden."
+        except MatchConflict:
+            time.sleep(random.uniform(0, CONFLICT_BACKOFF_S * (2 ** attempt)))
+    return False, "Match wurde gleichzeitig geändert. Bitte erneut versuchen."
+
+
+def create_match(con: sqlite3.Connection, room_code: str, state: dict) -> Tuple[int, List[str]]:
+    """Store a new match inside the caller's transaction; returns (version, log lines) for match_started."""
+    now = int(time.time())
+    lines = duel.drain_log(state)
+    state_json = json.dumps(duel.compact_state(state))
+    # versions never repeat for a room code, not even after the sweep archived the
+    # old match: stale copies in other processes then fail the version probe, the
+    # put check, the flush guard and the CAS instead of overwriting the new match
+    row = con.execute("SELECT version FROM matches WHERE room_code=?", (room_code,)).fetchone()
+    if row is None:
+        row = con.execute("SELECT MAX(version) AS version FROM match_archive WHERE room_code=?",
+                          (room_code,)).fetchone()
+    seq = int(row["version"]) + 1 if row["version"] is not None else 0
+    con.execute("DELETE FROM match_events WHERE room_code=?", (room_code,))
+    con.execute("DELETE FROM match_log WHERE room_code=?", (room_code,))
+    _write_log(con, room_code, lines, now)
+    con.execute(
+        "INSERT INTO match_events(room_code, seq, kind, payload, created_at) VALUES (?, ?, 'start', ?, ?)",
+        (room_code, seq, state_json, now),
+    )
+    con.execute(
+        "INSERT OR REPLACE INTO matches(room_code, state_json, snapshot_seq, version, updated_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (room_code, state_json, seq, seq, now),
+    )
+    return seq, lines
+
+
+def match_started(room_code: str, state: dict, version: int, lines: List[str]) -> None:
+    """After create_match's transaction committed: cache the match and publish the start."""
+    _remember(room_code, state, version, version)
+    _publish(room_code, version, "start", state, lines)
+
+
+def match_create(room_code: str, state: dict) -> None:
+    with match_db(room_code, immediate=True) as con:
+        seq, lines = create_match(con, room_code, state)
+    match_started(room_code, state, seq, lines)
+
+
+def _match_assign_once(room_code: str, user_id: int, slot: int, card_code: str) -> Tuple[bool, str]:
+    state, version, snap = _load_for_write(room_code)
+
+    ok, msg = duel.assign_card(state, user_id, slot, card_code)
+    if not ok:
+        return False, msg
+
+    payload = {"user_id": int(user_id), "slot": int(slot), "card_code": card_code}
+    lines = list(state["log"])
+    with match_db(room_code, immediate=True) as con:
+        if _room_closed(con, room_code):
+            return False, "Raum ist geschlossen."
+        seq, snap = _append(con, room_code, version, snap, "assign", payload, state)
+    _remember(room_code, state, seq, snap)
+    _publish(room_code, seq, "assign", state, lines)
+    return True, msg
+
+
+def _match_advance_phase_once(room_code: str, user_id: int) -> Tuple[bool, str]:
+    state, version, snap = _load_for_write(room_code)
+
+    incidents: List[str] = []
+    seeded = "rng" in state
+    draw = duel.seeded_draw(state) if seeded else duel.recording_draw(incidents)
+    ok, msg, winner = duel.advance_phase(state, user_id, draw)
+    if not ok:
+        return False, msg
+
+    payload = {"user_id": int(user_id)} if seeded else {"user_id": int(user_id), "incidents": incidents}
+    lines = list(state["log"])
+    with match_db(room_code, immediate=True) as con:
+        if _room_closed(con, room_code):
+            return False, "Raum ist geschlossen."
+        seq, snap = _append(con, room_code, version, snap, "advance", payload, state)
+        reward = _queue_reward(con, room_code, winner, duel.ROUND_WIN_COINS) if winner is not None else None
+    _remember(room_code, state, seq, snap)
+    _publish(room_code, seq, "advance", state, lines)
+    if reward is not None:
+        _pay_reward(match_db_path(room_code), *reward)
+    return True, msg
+
+
+def match_assign(room_code: str, user_id: int, slot: int, card_code: str) -> Tuple[bool, str]:
+    return with_conflict_retry(_match_assign_once, room_code, user_id, slot, card_code)
+
+
+def match_advance_phase(room_code: str, user_id: int) -> Tuple[bool, str]:
+    return with_conflict_retry(_match_advance_phase_once, room_code, user_id)
+
+
+# =========================================================
+# REWARDS
+# =========================================================
+# Coins live in the account DB, which may be another file. A round win is queued
+# in match_rewards in the same commit as its event and paid afterwards; the
+# reward_ledger row, written with the coins, makes a retried payment a no-op.
+# After a crash between the two commits, pay_pending_rewards() (run by the sweep)
+# pays the leftover rows.
+
+REWARD_BATCH = 100
+REWARD_RETRY_AFTER_S = 60  # older outbox rows missed their payment
+
+
+def _queue_reward(con: sqlite3.Connection, room_code: str, user_id: int, coins: int) -> Tuple[str, int, int]:
+    reward_id = secrets.token_hex(8)
+    con.execute(
+        "INSERT INTO match_rewards(reward_id, room_code, user_id, coins, created_at) VALUES (?, ?, ?, ?, ?)",
+        (reward_id, room_code, int(user_id), int(coins), int(time.time())),
+    )
+    return reward_id, int(user_id), int(coins)
+
+
+def _pay_reward(path: str, reward_id: str, user_id: int, coins: int) -> bool:
+    with db(immediate=True) as acc:
+        cur = acc.execute(
+            "INSERT OR IGNORE INTO reward_ledger(reward_id, user_id, coins, paid_at) VALUES (?, ?, ?, ?)",
+            (reward_id, user_id, coins, int(time.time())),
+        )
+        if cur.rowcount == 1:
+            acc.execute("UPDATE users SET coins=coins+? WHERE id=?", (coins, user_id))
+    with get_pool(path).connection() as con:
+        con.execute("DELETE FROM match_rewards WHERE reward_id=?", (reward_id,))
+    return cur.rowcount == 1
+
+
+def pay_pending_rewards(now: Optional[int] = None) -> int:
+    """Pay outbox rows whose payment after the commit did not happen (crash); returns how many."""
+    cutoff = int(now if now is not None else time.time()) - REWARD_RETRY_AFTER_S
+    paid = 0
+    for path in match_db_paths():
+        with get_pool(path).connection() as con:
+            rows = con.execute(
+                "SELECT reward_id, user_id, coins FROM match_rewards WHERE created_at<? ORDER BY created_at LIMIT ?",
+                (cutoff, REWARD_BATCH),
+            ).fetchall()
+        for r in rows:
+            paid += int(_pay_reward(path, r["reward_id"], int(r["user_id"]), int(r["coins"])))
+    return paid
+
+
+# =========================================================
+# ARCHIVE
+# =========================================================
+
+def archive_match(con: sqlite3.Connection, room_code: str, room_state: str, now: int) -> bool:
+    """Move a match (final state, events, log) into match_archive inside the caller's transaction."""
+    try:
+        state, version, _ = _load(con, room_code)
+    except RuntimeError:
+        return False
+    events = con.execute(
+        "SELECT seq, kind, payload, created_at FROM match_events WHERE room_code=? ORDER BY seq",
+        (room_code,),
+    ).fetchall()
+    lines = con.execute("SELECT line FROM match_log WHERE room_code=? ORDER BY id", (room_code,)).fetchall()
+    started_at = int(events[0]["created_at"]) if events else now
+    con.execute(
+        "INSERT INTO match_archive(room_code, room_state, version, state_json, events_json, log_json, "
+        "started_at, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            room_code, room_state, version, json.dumps(duel.compact_state(state)),
+            json.dumps([[e["seq"], e["kind"], json.loads(e["payload"])] for e in events]),
+            json.dumps([r["line"] for r in lines]),
+            started_at, now,
+        ),
+    )
+    con.execute("DELETE FROM match_events WHERE room_code=?", (room_code,))
+    con.execute("DELETE FROM match_log WHERE room_code=?", (room_code,))
+    con.execute("DELETE FROM matches WHERE room_code=?", (room_code,))
+    if _ACTIVE is not None:
+        _ACTIVE.drop(room_code)
+    return True
@@ -0,0 +1,249 @@
+"""Duel rooms: creation, joining, match start and the room lifecycle.
+
+    python rooms.py sweep [--vacuum]    expire idle rooms, archive finished matches
+    python rooms.py stats               table sizes
+
+Room states: open -> in_match -> finished (ended by a player) or abandoned (idle
+past its TTL). sweep() moves matches of finished/abandoned rooms into
+match_archive and deletes the room, so live tables only hold live rooms.
+"""
+import argparse
+import json
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
+
+from accounts import read_deck
+from cards import deck_to_list, validate_deck_40
+from duel import new_match_state, new_seed
+from match_store import archive_match, create_match, match_started, pay_pending_rewards
+from storage import all_table_stats, db, get_pool, match_db, match_db_paths, vacuum
+
+ROOM_OPEN = "open"
+ROOM_IN_MATCH = "in_match"
+ROOM_FINISHED = "finished"
+ROOM_ABANDONED = "abandoned"
+ROOM_CLOSED = (ROOM_FINISHED, ROOM_ABANDONED)
+
+OPEN_ROOM_TTL_S = 2 * 3600        # nobody started a match
+IDLE_MATCH_TTL_S = 24 * 3600      # no match action for this long
+SWEEP_BATCH = 200
+
+
+# =========================================================
+# DUEL SYSTEM (Rooms + Match State)
+# =========================================================
+
+def room_create(user_id: int, custom_code: str = "") -> Tuple[bool, str, Optional[str]]:
+    code = (custom_code or "").strip().upper()
+    if not code:
+        code = secrets.token_hex(3).upper()
+
+    with match_db(code, immediate=True) as con:
+        exists = con.execute("SELECT room_code FROM rooms WHERE room_code=?", (code,)).fetchone()
+        if exists:
+            return False, "Raumcode existiert bereits.", None
+
+        now = int(time.time())
+        con.execute(
+            "INSERT INTO rooms(room_code, host_user_id, created_at, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (code, user_id, now, ROOM_OPEN, now),
+        )
+        con.execute("INSERT INTO room_players(room_code, user_id, joined_at) VALUES (?, ?, ?)", (code, user_id, now))
+    return True, "Raum erstellt.", code
+
+
+def room_join(user_id: int, room_code: str) -> Tuple[bool, str]:
+    code = room_code.strip().upper()
+    with match_db(code) as con:
+        room = con.execute("SELECT state FROM rooms WHERE room_code=?", (code,)).fetchone()
+        if not room:
+            return False, "Raum nicht gefunden."
+        if room["state"] in ROOM_CLOSED:
+            return False, "Raum ist geschlossen."
+
+        now = int(time.time())
+        con.execute(
+            "INSERT OR IGNORE INTO room_players(room_code, user_id, joined_at) VALUES (?, ?, ?)",
+            (code, user_id, now),
+        )
+        con.execute("UPDATE rooms SET updated_at=? WHERE room_code=?", (now, code))
+    return True, "Raum beigetreten."
+
+
+def room_status(room_code: str) -> dict:
+    code = room_code.strip().upper()
+    with match_db(code) as con:
+        room = con.execute("SELECT * FROM rooms WHERE room_code=?", (code,)).fetchone()
+        if not room:
+            raise RuntimeError("Room not found")
+
+        player_ids = [int(r["user_id"]) for r in con.execute(
+            "SELECT user_id FROM room_players WHERE room_code=? ORDER BY joined_at", (code,)
+        ).fetchall()]
+
+        match = con.execute("SELECT room_code FROM matches WHERE room_code=?", (code,)).fetchone()
+
+    # users live in the account DB, which may be another file: no JOIN across them
+    with db() as con:
+        names = {int(r["id"]): r["username"] for r in con.execute(
+            f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(player_ids))})", player_ids
+        ).fetchall()} if player_ids else {}
+
+    return {
+        "room_code": code,
+        "state": room["state"],
+        "players": [{"id": uid, "username": names[uid]} for uid in player_ids if uid in names],
+        "match_started": bool(match),
+    }
+
+
+def get_deck_list_or_raise(user_id: int) -> List[str]:
+    deck = read_deck(user_id)  # uncached: a deck saved in another worker must be the one dealt
+    validate_deck_40(deck)
+    return deck_to_list(deck)  # new_match_state shuffles it with the match seed
+
+
+def match_start(room_code: str) -> Tuple[bool, str]:
+    status = room_status(room_code)
+    if status["state"] in ROOM_CLOSED:
+        return False, "Raum ist geschlossen."
+    if status["state"] != ROOM_OPEN:
+        return False, "Match läuft bereits."
+    if len(status["players"]) != 2:
+        return False, "MVP: Genau 2 Spieler im Raum erforderlich."
+
+    p1_id = status["players"][0]["id"]
+    p2_id = status["players"][1]["id"]
+
+    # Decks müssen valide sein (40)
+    try:
+        deck1 = get_deck_list_or_raise(p1_id)
+        deck2 = get_deck_list_or_raise(p2_id)
+    except Exception as e:
+        return False, f"Deck-Fehler: {e}"
+
+    code = status["room_code"]
+    state = new_match_state(p1_id, p2_id, deck1, deck2, seed=new_seed())
+    # re-checked under the write lock: a concurrent start, finish or expiry may have
+    # landed since room_status; match and room state commit together
+    with match_db(code, immediate=True) as con:
+        room = con.execute("SELECT state FROM rooms WHERE room_code=?", (code,)).fetchone()
+        if not room:
+            return False, "Raum nicht gefunden."
+        if room["state"] != ROOM_OPEN:
+            return False, "Raum ist geschlossen." if room["state"] in ROOM_CLOSED else "Match läuft bereits."
+        players = [int(r["user_id"]) for r in con.execute(
+            "SELECT user_id FROM room_players WHERE room_code=? ORDER BY joined_at", (code,)
+        ).fetchall()]
+        if players != [p1_id, p2_id]:
+            return False, "Spieler im Raum haben sich geändert."
+        version, lines = create_match(con, code, state)
+        con.execute("UPDATE rooms SET state=?, updated_at=? WHERE room_code=?", (ROOM_IN_MATCH, int(time.time()), code))
+    match_started(code, state, version, lines)
+    return True, "Match gestartet."
+
+
+# =========================================================
+# LIFECYCLE
+# =========================================================
+
+def room_finish(user_id: int, room_code: str) -> Tuple[bool, str]:
+    """A player ends the match; match_store rejects further actions and the next sweep archives it."""
+    code = room_code.strip().upper()
+    with match_db(code, immediate=True) as con:
+        room = con.execute("SELECT state FROM rooms WHERE room_code=?", (code,)).fetchone()
+        if not room:
+            return False, "Raum nicht gefunden."
+        member = con.execute(
+            "SELECT 1 FROM room_players WHERE room_code=? AND user_id=?", (code, int(user_id))
+        ).fetchone()
+        if not member:
+            return False, "Nicht in diesem Raum."
+        if room["state"] != ROOM_IN_MATCH:
+            return False, "Kein laufendes Match."
+        con.execute(
+            "UPDATE rooms SET state=?, updated_at=? WHERE room_code=?", (ROOM_FINISHED, int(time.time()), code)
+        )
+    return True, "Match beendet."
+
+
+def expire_idle_rooms(now: Optional[int] = None) -> int:
+    """Mark open rooms and running matches that sat idle past their TTL as abandoned."""
+    now = int(now if now is not None else time.time())
+    n = 0
+    for path in match_db_paths():
+        with get_pool(path).connection(immediate=True) as con:
+            cur = con.execute(
+                "UPDATE rooms SET state=?, updated_at=? WHERE state=? AND updated_at<?",
+                (ROOM_ABANDONED, now, ROOM_OPEN, now - OPEN_ROOM_TTL_S),
+            )
+            n += cur.rowcount
+            idle = con.execute(
+                "SELECT r.room_code FROM rooms r JOIN matches m ON m.room_code=r.room_code "
+                "WHERE r.state=? AND m.updated_at<?",
+                (ROOM_IN_MATCH, now - IDLE_MATCH_TTL_S),
+            ).fetchall()
+            con.executemany(
+                "UPDATE rooms SET state=?, updated_at=? WHERE room_code=?",
+                [(ROOM_ABANDONED, now, r["room_code"]) for r in idle],
+            )
+            n += len(idle)
+    return n
+
+
+def archive_closed_rooms(now: Optional[int] = None, batch: int = SWEEP_BATCH) -> Tuple[int, int]:
+    """Archive matches of finished/abandoned rooms and delete the rooms. Returns (rooms, matches)."""
+    now = int(now if now is not None else time.time())
+    rooms_done = matches_done = 0
+    for path in match_db_paths():
+        for state in ROOM_CLOSED:
+            while True:
+                # small batches keep each write transaction (and the lock) short
+                with get_pool(path).connection(immediate=True) as con:
+                    codes = [r["room_code"] for r in con.execute(
+                        "SELECT room_code FROM rooms WHERE state=? LIMIT ?", (state, int(batch))
+                    ).fetchall()]
+                    for code in codes:
+                        matches_done += int(archive_match(con, code, state, now))
+                        con.execute("DELETE FROM room_players WHERE room_code=?", (code,))
+                        con.execute("DELETE FROM rooms WHERE room_code=?", (code,))
+                rooms_done += len(codes)
+                if len(codes) < batch:
+                    break
+    return rooms_done, matches_done
+
+
+def sweep(now: Optional[int] = None, run_vacuum: bool = False) -> Dict[str, int]:
+    expired = expire_idle_rooms(now)
+    rooms_done, matches_done = archive_closed_rooms(now)
+    rewards = pay_pending_rewards(now)
+    if run_vacuum:
+        vacuum()
+    return {"expired": expired, "rooms_removed": rooms_done, "matches_archived": matches_done,
+            "rewards_paid": rewards}
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main() -> None:
+    from storage import init_db
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_sw = sub.add_parser("sweep", help="expire idle rooms and archive finished matches")
+    p_sw.add_argument("--vacuum", action="store_true", help="VACUUM the DB file afterwards")
+    sub.add_parser("stats", help="row counts per table and size of every DB file")
+    args = ap.parse_args()
+
+    init_db()
+    if args.cmd == "sweep":
+        print(json.dumps(sweep(run_vacuum=args.vacuum)))
+    elif args.cmd == "stats":
+        print(json.dumps(all_table_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
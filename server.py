@@ -0,0 +1,358 @@
+"""HTTP API for the duel and collection engine.
+
+    uvicorn server:app --workers 4
+
+All state lives in SQLite (see storage.py), including login sessions, so any
+worker can serve any request. Endpoints are plain ``def`` handlers: FastAPI runs
+them in its thread pool, which matches the blocking connection pool.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Dict, List
+
+from fastapi import Depends, FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+import accounts
+import delta
+import match_store
+import rooms
+from broker import get_broker
+from cache import cache_stats
+from cards import starter_decks
+from storage import db_label, db_paths, init_db, table_stats
+
+SWEEP_INTERVAL_S = 300  # room expiry / match archival, see rooms.sweep
+FLUSH_INTERVAL_S = 30   # idle active matches / pending snapshots, see match_store.ActiveMatches
+
+
+# table sizes count every row of every DB file: taken once per sweep, served from here
+_TABLE_STATS: Dict[str, object] = {"taken_at": None, "files": {}}
+
+
+def _snapshot_tables() -> None:
+    global _TABLE_STATS
+    _TABLE_STATS = {"taken_at": int(time.time()), "files": {db_label(p): table_stats(p) for p in db_paths()}}
+
+
+async def _sweep_loop() -> None:
+    # every worker runs it; the batches are idempotent, so overlapping sweeps are harmless
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_S)
+        await run_in_threadpool(rooms.sweep)
+        await run_in_threadpool(_snapshot_tables)
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL_S)
+        await run_in_threadpool(match_store.flush_active_matches)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    tasks = [asyncio.create_task(_sweep_loop()), asyncio.create_task(_flush_loop())]
+    yield
+    for t in tasks:
+        t.cancel()
+    active = match_store.get_active_matches()
+    if active is not None:
+        await run_in_threadpool(active.flush, False)
+
+
+app = FastAPI(title="BF-TCG", lifespan=lifespan)
+
+
+# =========================================================
+# MODELS
+# =========================================================
+
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+
+class Registration(Credentials):
+    starter_deck: str
+
+
+class DeckIn(BaseModel):
+    name: str = "Eigenes Deck"
+    cards: Dict[str, int]
+
+
+class RoomIn(BaseModel):
+    code: str = ""
+
+
+class AssignIn(BaseModel):
+    slot: int
+    card_code: str
+
+
+class Msg(BaseModel):
+    ok: bool
+    msg: str
+
+
+class Session(BaseModel):
+    token: str
+    user_id: int
+    username: str
+    coins: int
+
+
+# =========================================================
+# HELPERS
+# =========================================================
+
+def _check(ok: bool, msg: str) -> Msg:
+    if not ok:
+        raise HTTPException(status_code=400, detail=msg)
+    return Msg(ok=True, msg=msg)
+
+
+def current_user(authorization: str = Header(default="")) -> int:
+    scheme, _, token = authorization.partition(" ")
+    user_id = accounts.session_user(token) if scheme.lower() == "bearer" and token else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Nicht eingeloggt.")
+    return user_id
+
+
+def _room_players(code: str) -> List[int]:
+    try:
+        status = rooms.room_status(code)
+    except RuntimeError:
+        raise HTTPException(status_code=404, detail="Raum nicht gefunden.")
+    return [p["id"] for p in status["players"]]
+
+
+def _require_member(code: str, user_id: int) -> None:
+    if user_id not in _room_players(code):
+        raise HTTPException(status_code=403, detail="Nicht in diesem Raum.")
+
+
+def player_view(state: dict, user_id: int) -> dict:
+    """The match state as one player may see it: own hand, only counts for the rest."""
+    view = {k: v for k, v in state.items() if k != "rng"}  # the seed would reveal piles and incidents
+    players = {}
+    for uid, p in state["players"].items():
+        q = {k: v for k, v in p.items() if k not in ("hand", "draw_pile")}
+        q["hand_count"] = len(p["hand"])
+        q["draw_pile_count"] = len(p["draw_pile"])
+        if uid == str(user_id):
+            q["hand"] = list(p["hand"])
+        players[uid] = q
+    view["players"] = players
+    return view
+
+
+# =========================================================
+# AUTH
+# =========================================================
+
+@app.get("/starter-decks")
+def list_starter_decks() -> Dict[str, Dict[str, int]]:
+    return starter_decks()
+
+
+@app.post("/register", response_model=Msg)
+def register(body: Registration) -> Msg:
+    return _check(*accounts.register_user(body.username, body.password, body.starter_deck))
+
+
+@app.post("/login", response_model=Session)
+def login(body: Credentials) -> Session:
+    user = accounts.login_user(body.username, body.password)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login fehlgeschlagen.")
+    return Session(token=accounts.create_session(user["user_id"]), **user)
+
+
+@app.post("/logout", response_model=Msg)
+def logout(authorization: str = Header(default="")) -> Msg:
+    accounts.delete_session(authorization.partition(" ")[2])
+    return Msg(ok=True, msg="Ausgeloggt.")
+
+
+@app.get("/metrics/cache")
+def metrics_cache(user_id: int = Depends(current_user)) -> List[dict]:
+    active = match_store.get_active_matches()
+    return cache_stats() + ([active.stats()] if active is not None else [])
+
+
+@app.get("/metrics/tables")
+def metrics_tables(user_id: int = Depends(current_user)) -> dict:
+    """Table sizes as of the last sweep (taken_at is None until the first one)."""
+    return _TABLE_STATS
+
+
+@app.get("/me")
+def me(user_id: int = Depends(current_user)) -> dict:
+    return accounts.refresh_user(user_id)
+
+
+# =========================================================
+# COLLECTION / DECK / BOOSTER
+# =========================================================
+
+@app.get("/collection")
+def collection(user_id: int = Depends(current_user)) -> Dict[str, int]:
+    return accounts.get_collection(user_id)
+
+
+@app.get("/collection/page")
+def collection_page(page: int = 0, page_size: int = accounts.COLLECTION_PAGE_SIZE, theme: str = "",
+                    rarity: str = "", q: str = "", user_id: int = Depends(current_user)) -> dict:
+    page_size = min(max(1, page_size), 100)
+    items, total = accounts.collection_page(user_id, theme, rarity, q, page, page_size)
+    page = min(max(0, page), max(0, (total - 1) // page_size))
+    return {"total": total, "page": page, "page_size": page_size,
+            "items": [{"code": code, "qty": qty} for code, qty in items]}
+
+
+@app.get("/deck")
+def deck(user_id: int = Depends(current_user)) -> dict:
+    return {"name": accounts.get_deck_name(user_id), "cards": accounts.get_deck(user_id)}
+
+
+@app.put("/deck", response_model=Msg)
+def save_deck(body: DeckIn, user_id: int = Depends(current_user)) -> Msg:
+    return _check(*accounts.save_custom_deck(user_id, body.name, body.cards))
+
+
+@app.post("/boosters/{theme}")
+def buy_booster(theme: str, user_id: int = Depends(current_user)) -> dict:
+    ok, msg, cards = accounts.buy_open_booster(user_id, theme)
+    _check(ok, msg)
+    return {"ok": True, "msg": msg, "cards": [asdict(c) for c in cards or []]}
+
+
+# =========================================================
+# ROOMS / MATCHES
+# =========================================================
+
+@app.post("/rooms")
+def create_room(body: RoomIn, user_id: int = Depends(current_user)) -> dict:
+    ok, msg, code = rooms.room_create(user_id, body.code)
+    _check(ok, msg)
+    return {"ok": True, "msg": msg, "room_code": code}
+
+
+@app.post("/rooms/{code}/join", response_model=Msg)
+def join_room(code: str, user_id: int = Depends(current_user)) -> Msg:
+    return _check(*rooms.room_join(user_id, code))
+
+
+@app.get("/rooms/{code}")
+def get_room(code: str, user_id: int = Depends(current_user)) -> dict:
+    try:
+        return rooms.room_status(code)
+    except RuntimeError:
+        raise HTTPException(status_code=404, detail="Raum nicht gefunden.")
+
+
+@app.post("/rooms/{code}/start", response_model=Msg)
+def start_match(code: str, user_id: int = Depends(current_user)) -> Msg:
+    _require_member(code, user_id)
+    return _check(*rooms.match_start(code.strip().upper()))
+
+
+@app.post("/rooms/{code}/finish", response_model=Msg)
+def finish_match(code: str, user_id: int = Depends(current_user)) -> Msg:
+    return _check(*rooms.room_finish(user_id, code))
+
+
+@app.get("/matches/{code}")
+def get_match(code: str, user_id: int = Depends(current_user)) -> dict:
+    code = code.strip().upper()
+    _require_member(code, user_id)
+    try:
+        state = match_store.match_load(code)
+    except RuntimeError:
+        raise HTTPException(status_code=404, detail="Match nicht gefunden.")
+    return player_view(state, user_id)
+
+
+@app.get("/matches/{code}/log")
+def get_match_log(code: str, page: int = 0, user_id: int = Depends(current_user)) -> dict:
+    code = code.strip().upper()
+    _require_member(code, user_id)
+    return {"total": match_store.match_log_count(code), "page": page, "lines": match_store.match_log_page(code, page)}
+
+
+@app.post("/matches/{code}/assign", response_model=Msg)
+def assign(code: str, body: AssignIn, user_id: int = Depends(current_user)) -> Msg:
+    code = code.strip().upper()
+    _require_member(code, user_id)
+    return _check(*match_store.match_assign(code, user_id, body.slot, body.card_code))
+
+
+@app.post("/matches/{code}/advance", response_model=Msg)
+def advance(code: str, user_id: int = Depends(current_user)) -> Msg:
+    code = code.strip().upper()
+    _require_member(code, user_id)
+    return _check(*match_store.match_advance_phase(code, user_id))
+
+
+# =========================================================
+# PUSH
+# =========================================================
+# Browsers cannot set headers on a websocket, so the session token is a query
+# parameter. The first message is the full player view, later ones a delta.py
+# patch against the previous view: {"type": "patch", "version": n, "kind": ..., "ops": [...]}.
+
+@app.websocket("/ws/matches/{code}")
+async def match_updates(ws: WebSocket, code: str, token: str = "") -> None:
+    code = code.strip().upper()
+    user_id = await run_in_threadpool(accounts.session_user, token) if token else None
+    if user_id is None or user_id not in await run_in_threadpool(_ws_room_players, code):
+        await ws.close(code=4401)
+        return
+    await ws.accept()
+
+    loop = asyncio.get_running_loop()
+    inbox: "asyncio.Queue[dict]" = asyncio.Queue()
+    unsubscribe = get_broker().subscribe(code, lambda msg: loop.call_soon_threadsafe(inbox.put_nowait, msg))
+    closed = asyncio.ensure_future(_wait_closed(ws))
+    try:
+        try:
+            view = player_view(await run_in_threadpool(match_store.match_load, code), user_id)
+            await ws.send_json({"type": "full", "state": view})
+        except RuntimeError:
+            view = {}  # no match yet; the "start" event arrives as a patch against {}
+        while True:
+            getter = asyncio.ensure_future(inbox.get())
+            done, _ = await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed in done:
+                getter.cancel()
+                break
+            msg = getter.result()
+            new = player_view(msg["state"], user_id)
+            ops = delta.diff(view, new)
+            view = new
+            if ops:
+                await ws.send_json({"type": "patch", "version": msg["version"], "kind": msg["kind"], "ops": ops})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        unsubscribe()
+        closed.cancel()
+
+
+async def _wait_closed(ws: WebSocket) -> None:
+    # clients send nothing; reading is only how a disconnect is noticed
+    while (await ws.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+def _ws_room_players(code: str) -> List[int]:
+    try:
+        return _room_players(code)
+    except HTTPException:
+        return []
@@ -0,0 +1,213 @@
+"""Headless batch duel simulator for balance testing (no DB, no Streamlit).
+
+    python simulate.py --games 20000 --workers 8 --seed 1
+    python simulate.py --deck1 Brandbekämpfung --deck2 "Technische Hilfe" --max-rounds 15 --json
+    python simulate.py --stop-at-pressure-max
+    python simulate.py --bot1 greedy --bot2 mc --games 500
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import duel
+from bots import BOTS, make_bot
+from cards import deck_to_list, starter_decks
+
+P1, P2 = 1, 2
+MAX_ROUNDS = 12
+CHUNK_SIZE = 250
+
+
+# =========================================================
+# ONE GAME
+# =========================================================
+
+def is_over(state: dict, max_rounds: int, stop_at_pressure_max: bool) -> bool:
+    # the live game has no end condition yet; simulations stop after max_rounds and,
+    # optionally, when pressure reaches pressure_max
+    if int(state["round_no"]) > max_rounds:
+        return True
+    return stop_at_pressure_max and int(state["pressure"]) >= int(state["pressure_max"])
+
+
+def play_game(deck1: Dict[str, int], deck2: Dict[str, int], rng: random.Random,
+              max_rounds: int = MAX_ROUNDS, stop_at_pressure_max: bool = False,
+              bot1=None, bot2=None) -> dict:
+    draw = duel.rng_draw(rng)
+    cards1 = deck_to_list(deck1)
+    cards2 = deck_to_list(deck2)
+    rng.shuffle(cards1)
+    rng.shuffle(cards2)
+    state = duel.new_match_state(P1, P2, cards1, cards2, draw)
+    bots = {P1: bot1 or make_bot("random"), P2: bot2 or make_bot("random")}
+
+    pressure_curve: List[int] = []
+    round_no = 1
+    while not is_over(state, max_rounds, stop_at_pressure_max):
+        uid = int(state["active_player"])
+        if state["phase"] == "planung":
+            move = bots[uid].choose(state, uid, rng)
+            if move is not None:
+                duel.assign_card(state, uid, move[0], move[1])
+        ok, msg, _ = duel.advance_phase(state, uid, draw)
+        if not ok:
+            raise RuntimeError(msg)
+        if int(state["round_no"]) != round_no:
+            pressure_curve.append(int(state["pressure"]))
+            round_no = int(state["round_no"])
+
+    ew1 = int(state["players"][str(P1)]["ew"])
+    ew2 = int(state["players"][str(P2)]["ew"])
+    winner: Optional[int] = None
+    if ew1 != ew2:
+        winner = P1 if ew1 > ew2 else P2
+    return {
+        "winner": winner,
+        "rounds": int(state["round_no"]) - 1,
+        "ew": (ew1, ew2),
+        "collapsed": int(state["pressure"]) >= int(state["pressure_max"]),  # pressure_max reached
+        "pressure_curve": pressure_curve,
+    }
+
+
+# =========================================================
+# BATCH
+# =========================================================
+
+def empty_stats() -> dict:
+    return {"games": 0, "wins_a": 0, "wins_b": 0, "draws": 0, "rounds": 0, "collapsed": 0,
+            "ew_a": 0, "ew_b": 0, "pressure_sum": [], "pressure_n": []}
+
+
+def merge_stats(a: dict, b: dict) -> dict:
+    for k in ("games", "wins_a", "wins_b", "draws", "rounds", "collapsed", "ew_a", "ew_b"):
+        a[k] += b[k]
+    for key in ("pressure_sum", "pressure_n"):
+        if len(a[key]) < len(b[key]):
+            a[key].extend([0] * (len(b[key]) - len(a[key])))
+        for i, v in enumerate(b[key]):
+            a[key][i] += v
+    return a
+
+
+def run_chunk(task: Tuple[int, int, int, Dict[str, int], Dict[str, int], int, bool, str, str]) -> dict:
+    seed, chunk_idx, n_games, deck_a, deck_b, max_rounds, stop, bot_a_name, bot_b_name = task
+    # one RNG per chunk: results depend on (seed, chunk) only, not on worker scheduling
+    rng = random.Random(seed * 1_000_003 + chunk_idx)
+    bot_a = make_bot(bot_a_name)
+    bot_b = make_bot(bot_b_name)
+    stats = empty_stats()
+    for g in range(n_games):
+        # alternate seats so the first-player advantage cancels out
+        a_first = (chunk_idx * CHUNK_SIZE + g) % 2 == 0
+        if a_first:
+            res = play_game(deck_a, deck_b, rng, max_rounds, stop, bot_a, bot_b)
+        else:
+            res = play_game(deck_b, deck_a, rng, max_rounds, stop, bot_b, bot_a)
+        seat_a = P1 if a_first else P2
+        ew_a, ew_b = res["ew"] if a_first else res["ew"][::-1]
+
+        stats["games"] += 1
+        stats["rounds"] += res["rounds"]
+        stats["collapsed"] += int(res["collapsed"])
+        stats["ew_a"] += ew_a
+        stats["ew_b"] += ew_b
+        if res["winner"] is None:
+            stats["draws"] += 1
+        elif res["winner"] == seat_a:
+            stats["wins_a"] += 1
+        else:
+            stats["wins_b"] += 1
+        merge_stats(stats, {**empty_stats(), "pressure_sum": res["pressure_curve"],
+                            "pressure_n": [1] * len(res["pressure_curve"])})
+    return stats
+
+
+def simulate(deck_a: Dict[str, int], deck_b: Dict[str, int], games: int, workers: int = 0,
+             seed: int = 0, max_rounds: int = MAX_ROUNDS, stop_at_pressure_max: bool = False,
+             bot_a: str = "random", bot_b: str = "random") -> dict:
+    tasks = []
+    for idx, start in enumerate(range(0, games, CHUNK_SIZE)):
+        tasks.append((seed, idx, min(CHUNK_SIZE, games - start), deck_a, deck_b, max_rounds,
+                      stop_at_pressure_max, bot_a, bot_b))
+
+    stats = empty_stats()
+    if workers == 1:
+        for t in tasks:
+            merge_stats(stats, run_chunk(t))
+    else:
+        with multiprocessing.Pool(workers or None) as pool:
+            for part in pool.imap_unordered(run_chunk, tasks):
+                merge_stats(stats, part)
+    return summarize(stats)
+
+
+def summarize(stats: dict) -> dict:
+    n = max(1, stats["games"])
+    return {
+        "games": stats["games"],
+        "win_rate_a": stats["wins_a"] / n,
+        "win_rate_b": stats["wins_b"] / n,
+        "draw_rate": stats["draws"] / n,
+        "avg_rounds": stats["rounds"] / n,
+        "collapse_rate": stats["collapsed"] / n,
+        "avg_ew_a": stats["ew_a"] / n,
+        "avg_ew_b": stats["ew_b"] / n,
+        "pressure_curve": [s / c for s, c in zip(stats["pressure_sum"], stats["pressure_n"]) if c],
+    }
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main() -> None:
+    decks = starter_decks()
+    names = list(decks.keys())
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--deck1", default=None, choices=names, help="default: all starter deck pairings")
+    ap.add_argument("--deck2", default=None, choices=names)
+    ap.add_argument("--games", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=0, help="0 = one per CPU, 1 = in-process")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    ap.add_argument("--stop-at-pressure-max", action="store_true")
+    ap.add_argument("--bot1", default="random", choices=sorted(BOTS), help="policy playing deck1")
+    ap.add_argument("--bot2", default="random", choices=sorted(BOTS), help="policy playing deck2")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    if args.deck1 and args.deck2:
+        pairings = [(args.deck1, args.deck2)]
+    else:
+        pairings = [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+
+    results = []
+    for a, b in pairings:
+        t0 = time.perf_counter()
+        res = simulate(decks[a], decks[b], args.games, args.workers, args.seed, args.max_rounds,
+                       args.stop_at_pressure_max, args.bot1, args.bot2)
+        res.update({"deck_a": a, "deck_b": b, "bot_a": args.bot1, "bot_b": args.bot2,
+                    "seconds": time.perf_counter() - t0})
+        results.append(res)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    for r in results:
+        curve = " ".join(f"{p:.1f}" for p in r["pressure_curve"])
+        print(f"{r['deck_a']} ({r['bot_a']}) vs {r['deck_b']} ({r['bot_b']}): {r['games']} Spiele in {r['seconds']:.1f}s "
+              f"({r['games'] / r['seconds']:.0f}/s)")
+        print(f"  Siege {r['win_rate_a']:.1%} / {r['win_rate_b']:.1%}  Remis {r['draw_rate']:.1%}  "
+              f"Runden Ø {r['avg_rounds']:.1f}  Kollaps {r['collapse_rate']:.1%}  "
+              f"EW Ø {r['avg_ew_a']:.2f} / {r['avg_ew_b']:.2f}")
+        print(f"  Druck je Runde: {curve}")
+
+
+if __name__ == "__main__":
+    main()
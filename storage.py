@@ -0,0 +1,434 @@
+import os
+import queue
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+DB_PATH = os.environ.get("BFTCG_DB", "bftcg.sqlite3")
+# Rooms and matches can live in their own file(s) so match writes don't queue
+# behind booster purchases and registrations on one write lock. Empty = DB_PATH.
+# With MATCH_SHARDS > 1 the rooms are spread over "<name>-<n>.sqlite3" by a
+# hash of the room code. Set both before the first start: rooms already stored
+# elsewhere are not moved.
+MATCH_DB_PATH = os.environ.get("BFTCG_MATCH_DB", "")
+MATCH_SHARDS = int(os.environ.get("BFTCG_MATCH_SHARDS", "1"))
+POOL_SIZE = int(os.environ.get("BFTCG_DB_POOL", "8"))
+POOL_WAIT_S = 10.0
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE = 256
+
+
+# =========================================================
+# CONNECTIONS
+# =========================================================
+
+def connect(path: str) -> sqlite3.Connection:
+    # sqlite3 keeps a per-connection LRU of prepared statements keyed by SQL text,
+    # so reusing pooled connections with constant SQL strings reuses the statements.
+    con = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE,
+    )
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return con
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections for one database file."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = max(1, int(size))
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return connect(self.path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=POOL_WAIT_S)
+        except queue.Empty:
+            raise RuntimeError("Keine freie DB-Verbindung (Pool erschöpft).")
+
+    def _release(self, con: sqlite3.Connection) -> None:
+        try:
+            if con.in_transaction:
+                con.rollback()
+        except sqlite3.Error:
+            # broken connection: drop it, a fresh one is opened on demand
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(con)
+
+    @contextmanager
+    def connection(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; commits on success, rolls back on error.
+
+        ``immediate=True`` takes the write lock up front (BEGIN IMMEDIATE), which
+        avoids lock-upgrade failures for read-modify-write transactions in WAL mode.
+        """
+        con = self._acquire()
+        try:
+            if immediate:
+                con.execute("BEGIN IMMEDIATE")
+            yield con
+            if con.in_transaction:
+                con.commit()
+        except BaseException:
+            if con.in_transaction:
+                con.rollback()
+            raise
+        finally:
+            self._release(con)
+
+    def close(self) -> None:
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._created -= 1
+
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(path: Optional[str] = None) -> ConnectionPool:
+    # Pools live at module level so they survive Streamlit script reruns.
+    path = path or DB_PATH
+    with _POOLS_LOCK:
+        pool = _POOLS.get(path)
+        if pool is None:
+            pool = ConnectionPool(path)
+            _POOLS[path] = pool
+        return pool
+
+
+def db(immediate: bool = False):
+    """Account data: users, collections, decks, sessions, purchases."""
+    return get_pool().connection(immediate=immediate)
+
+
+# =========================================================
+# ROUTING
+# =========================================================
+
+def match_db_paths() -> List[str]:
+    if not MATCH_DB_PATH:
+        return [DB_PATH]
+    if MATCH_SHARDS <= 1:
+        return [MATCH_DB_PATH]
+    root, ext = os.path.splitext(MATCH_DB_PATH)
+    return [f"{root}-{i}{ext}" for i in range(MATCH_SHARDS)]
+
+
+def match_db_path(room_code: str) -> str:
+    paths = match_db_paths()
+    if len(paths) == 1:
+        return paths[0]
+    # crc32, not hash(): the shard must not change between processes
+    return paths[zlib.crc32(room_code.encode("utf-8")) % len(paths)]
+
+
+def match_db(room_code: str, immediate: bool = False):
+    """Room / match data of one room: rooms, room_players, matches, match_events, match_log."""
+    return get_pool(match_db_path(room_code)).connection(immediate=immediate)
+
+
+def db_paths() -> List[str]:
+    paths = [DB_PATH]
+    for p in match_db_paths():
+        if p not in paths:
+            paths.append(p)
+    return paths
+
+
+def db_label(path: str) -> str:
+    """Name of a DB file for reports that must not show server paths."""
+    if path == DB_PATH:
+        return "main"
+    paths = match_db_paths()
+    return "matches" if len(paths) == 1 else f"matches-{paths.index(path)}"
+
+
+# =========================================================
+# SCHEMA / MIGRATIONS
+# =========================================================
+# The schema version lives in PRAGMA user_version. Each migration runs once, in
+# order, inside the same transaction as the version bump. Databases created
+# before versioning start at 0; the early steps are idempotent for them.
+# Every file of the layout gets the full schema; tables of the other side stay empty.
+
+def _m001_base(cur: sqlite3.Cursor) -> None:
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        coins INTEGER NOT NULL DEFAULT 0,
+        created_at INTEGER NOT NULL DEFAULT 0
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_cards(
+        user_id INTEGER NOT NULL,
+        card_code TEXT NOT NULL,
+        qty INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(user_id, card_code)
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS decks(
+        user_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL DEFAULT 'Standard',
+        size INTEGER NOT NULL DEFAULT 40
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS deck_cards(
+        user_id INTEGER NOT NULL,
+        card_code TEXT NOT NULL,
+        qty INTEGER NOT NULL,
+        PRIMARY KEY(user_id, card_code)
+    )""")
+
+    # Duellräume / Match State (All-in-One)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS rooms(
+        room_code TEXT PRIMARY KEY,
+        host_user_id INTEGER NOT NULL,
+        created_at INTEGER NOT NULL
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS room_players(
+        room_code TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        joined_at INTEGER NOT NULL,
+        PRIMARY KEY(room_code, user_id)
+    )""")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS matches(
+        room_code TEXT PRIMARY KEY,
+        state_json TEXT NOT NULL,
+        updated_at INTEGER NOT NULL
+    )""")
+
+
+def _m002_match_events(cur: sqlite3.Cursor) -> None:
+    _ensure_column(cur, "matches", "snapshot_seq", "INTEGER NOT NULL DEFAULT 0")
+    # version = seq of the newest event; saves are compare-and-swap on it
+    _ensure_column(cur, "matches", "version", "INTEGER NOT NULL DEFAULT 0")
+
+    # Append-only Match-Events; matches.state_json ist nur der letzte Snapshot
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS match_events(
+        room_code TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        PRIMARY KEY(room_code, seq)
+    )""")
+
+
+def _m003_match_log(cur: sqlite3.Cursor) -> None:
+    # Match-Log getrennt vom State, damit der State konstant klein bleibt
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS match_log(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_code TEXT NOT NULL,
+        line TEXT NOT NULL,
+        created_at INTEGER NOT NULL
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_match_log_room ON match_log(room_code, id)")
+
+
+def _m004_booster_purchases(cur: sqlite3.Cursor) -> None:
+    # Kaufbuch: eine Zeile je Booster-Kauf
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS booster_purchases(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        theme TEXT NOT NULL,
+        cost INTEGER NOT NULL,
+        cards TEXT NOT NULL,
+        created_at INTEGER NOT NULL
+    )""")
+
+
+def _m005_hot_path_indexes(cur: sqlite3.Cursor) -> None:
+    # room_status: WHERE room_code=? ORDER BY joined_at, joined to users by user_id
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_room_players_room ON room_players(room_code, joined_at, user_id)")
+    # collection / deck reads: WHERE user_id=? ORDER BY card_code, answered from the index alone
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_user_cards_cover ON user_cards(user_id, card_code, qty)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_deck_cards_cover ON deck_cards(user_id, card_code, qty)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_booster_purchases_user ON booster_purchases(user_id, created_at)")
+
+
+def _m006_sessions(cur: sqlite3.Cursor) -> None:
+    # API-Sessions in der DB, damit jeder Worker-Prozess jedes Token kennt
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sessions(
+        token TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        expires_at INTEGER NOT NULL
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions(expires_at)")
+
+
+def _m007_room_lifecycle(cur: sqlite3.Cursor) -> None:
+    # Raum-Status: open -> in_match -> finished | abandoned
+    _ensure_column(cur, "rooms", "state", "TEXT NOT NULL DEFAULT 'open'")
+    _ensure_column(cur, "rooms", "updated_at", "INTEGER NOT NULL DEFAULT 0")
+    cur.execute("UPDATE rooms SET updated_at=created_at WHERE updated_at=0")
+    cur.execute("UPDATE rooms SET state='in_match' WHERE room_code IN (SELECT room_code FROM matches)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rooms_state ON rooms(state, updated_at)")
+
+    # Kaltes Archiv beendeter Matches (Endstand, Events, Log als JSON)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS match_archive(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_code TEXT NOT NULL,
+        room_state TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        state_json TEXT NOT NULL,
+        events_json TEXT NOT NULL,
+        log_json TEXT NOT NULL,
+        started_at INTEGER NOT NULL,
+        archived_at INTEGER NOT NULL
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_match_archive_room ON match_archive(room_code, archived_at)")
+
+
+def _m008_match_rewards(cur: sqlite3.Cursor) -> None:
+    # Münz-Gewinne aus Matches: Outbox in der Match-DB, im selben Commit wie das Event ...
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS match_rewards(
+        reward_id TEXT PRIMARY KEY,
+        room_code TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        coins INTEGER NOT NULL,
+        created_at INTEGER NOT NULL
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_match_rewards_created ON match_rewards(created_at)")
+    # ... und Ledger in der Account-DB, damit jede Gutschrift genau einmal gebucht wird
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS reward_ledger(
+        reward_id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        coins INTEGER NOT NULL,
+        paid_at INTEGER NOT NULL
+    )""")
+
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Cursor], None]]] = [
+    (1, _m001_base),
+    (2, _m002_match_events),
+    (3, _m003_match_log),
+    (4, _m004_booster_purchases),
+    (5, _m005_hot_path_indexes),
+    (6, _m006_sessions),
+    (7, _m007_room_lifecycle),
+    (8, _m008_match_rewards),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(con: sqlite3.Connection) -> int:
+    return int(con.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """Apply pending migrations; the caller holds a write transaction. Returns the new version."""
+    current = schema_version(con)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(f"DB-Schema {current} ist neuer als diese App ({SCHEMA_VERSION}).")
+    cur = con.cursor()
+    for version, step in MIGRATIONS:
+        if version > current:
+            step(cur)
+            cur.execute(f"PRAGMA user_version={version}")
+            current = version
+    return current
+
+
+def init_db():
+    for path in db_paths():
+        pool = get_pool(path)
+        with pool.connection() as con:
+            if schema_version(con) == SCHEMA_VERSION:
+                continue  # fast path: every Streamlit rerun calls init_db()
+        with pool.connection(immediate=True) as con:
+            migrate(con)
+
+
+def _ensure_column(cur: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+    cols = {r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in cols:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# =========================================================
+# METRICS
+# =========================================================
+
+def table_stats(path: Optional[str] = None) -> Dict[str, object]:
+    """Row counts per table and the file's page usage (COUNT(*) scans; call on demand, not per request)."""
+    with get_pool(path).connection() as con:
+        tables = [r[0] for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()]
+        rows = {t: int(con.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0]) for t in tables}
+        page_size = int(con.execute("PRAGMA page_size").fetchone()[0])
+        pages = int(con.execute("PRAGMA page_count").fetchone()[0])
+        free = int(con.execute("PRAGMA freelist_count").fetchone()[0])
+    return {
+        "rows": rows,
+        "db_bytes": pages * page_size,
+        "free_bytes": free * page_size,
+        "schema_version": SCHEMA_VERSION,
+    }
+
+
+def all_table_stats() -> Dict[str, Dict[str, object]]:
+    return {path: table_stats(path) for path in db_paths()}
+
+
+def vacuum() -> None:
+    # VACUUM cannot run inside a transaction; the pooled connections are idle here
+    for path in db_paths():
+        with get_pool(path).connection() as con:
+            con.execute("VACUUM")